@@ -0,0 +1,46 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		__init__.py
+#		Purpose:	Clawhammer compiler package
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,importlib
+
+# ***************************************************************************************************
+#
+#		Nothing is imported here, so the command line starts quickly. The main classes can be
+#		got from the package (clawhammer.ClawhammerTune) and their module is imported the first
+#		time they are used.
+#
+# ***************************************************************************************************
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPORTS = {
+	"MusicException":	"musicex",
+	"Bar":				"bar",
+	"TuneCompiler":		"tune",
+	"ClawhammerTune":	"tune",
+	"StreamingTune":	"streamtune",
+	"MusicBuilder":		"buildtree",
+	"BuildIndex":		"buildindex",
+	"EventTable":		"events",
+	"SearchIndex":		"searchindex",
+	"TabView":			"tabview",
+}
+
+def __getattr__(name):
+	if name not in EXPORTS:
+		raise AttributeError("module 'clawhammer' has no attribute '"+name+"'")
+	return getattr(importlib.import_module("."+EXPORTS[name],__name__),name)
+#
+#		Path of something in the repository (music, agkbanjo/media/music ...) from the current
+#		directory, so the tools work from the repository or the clawhammer directory.
+#
+def getPath(*parts):
+	return os.path.relpath(os.path.join(ROOT,*parts))
@@ -0,0 +1,113 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		__main__.py
+#		Purpose:	Build everything in one process (python -m clawhammer)
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,argparse
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		Runs the build steps, all of them by default
+#
+#			compile 	compile changed tunes in the music tree
+#			index 		write the index for each directory and the catalog
+#			test 		write __test.plux, from the newest tune or the one given by -t
+#
+#		The target tree is walked once, when the compile step removes old outputs, and that
+#		walk is used for the indexes. Modules are only imported by the steps that use them.
+#
+# ***************************************************************************************************
+
+class BuildCommand(object):
+	def __init__(self,args):
+		self.args = args
+		self.steps = args.steps if len(args.steps) != 0 else BuildCommand.STEPS
+		self.builder = None
+		self.errors = []
+	#
+	#		Run the steps in order, returns the errors.
+	#
+	def run(self):
+		for step in BuildCommand.STEPS:
+			if step in self.steps:
+				getattr(self,step)()
+		return self.errors
+	#
+	#		Compile the music tree. The test step copies the newest tune itself.
+	#
+	def compile(self):
+		from .buildtree import MusicBuilder
+		from .profiler import CompileProfiler
+		profiler = CompileProfiler().start() if self.args.profile is not None else None
+		jobs = self.args.jobs if self.args.jobs > 0 else os.cpu_count()
+		self.builder = MusicBuilder(jobs,self.args.binary,self.args.events)
+		self.errors += self.builder.buildTree(self.args.source,self.args.target,"test" not in self.steps)
+		if profiler is not None:
+			profiler.stop()
+			profiler.save(self.args.profile)
+			print(profiler.summary())
+	#
+	#		Indexes and catalog, from the compile step's walk if there was one.
+	#
+	def index(self):
+		from .buildindex import BuildIndex
+		listing = self.builder.listing if self.builder is not None else None
+		BuildIndex().build(self.builder.targetDir if self.builder is not None else self.args.target,listing)
+	#
+	#		The test tune. The newest tune has already been compiled by the compile step, a
+	#		tune given by -t, or the newest without the compile step, is compiled here.
+	#
+	def test(self):
+		if self.args.test is None and self.builder is not None:
+			if self.builder.latestFile is not None:
+				self.builder.updateTest(self.builder.latestFile)
+			return
+		from .tune import ClawhammerTune
+		from .musicex import MusicException
+		sourceFile = self.args.test if self.args.test is not None else self.findLatest(self.args.source)
+		if sourceFile is None:
+			return
+		try:
+			if ClawhammerTune(sourceFile).render(self.args.target,"__test.plux"):
+				print("Updated __test.plux from "+sourceFile)
+		except MusicException as e:
+			self.errors += e.getMessage().split("\n")
+	#
+	#		Newest source, the first in tree order if there are several.
+	#
+	def findLatest(self,sourceDir):
+		latestTime,latestFile = 0,None
+		for root,dirs,files in os.walk(sourceDir):
+			dirs.sort()
+			for f in sorted([x for x in files if x.endswith(".claw")]):
+				time = os.stat(root+os.sep+f).st_mtime
+				if time > latestTime:
+					latestTime,latestFile = time,root+os.sep+f
+		return latestFile
+
+BuildCommand.STEPS = [ "compile","index","test" ]
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(prog = "python -m clawhammer",description = "Build the music library")
+	parser.add_argument("steps",nargs = "*",help = "steps to run ("+", ".join(BuildCommand.STEPS)+"), default all of them")
+	parser.add_argument("-t","--test",help = "compile this tune to __test.plux, default the newest")
+	parser.add_argument("-j","--jobs",type = int,default = 1,help = "worker processes (0 = one per core)")
+	parser.add_argument("-b","--binary",action = "store_true",help = "also write binary .pluxb files")
+	parser.add_argument("-e","--events",action = "store_true",help = "also write .events tables")
+	parser.add_argument("-p","--profile",help = "write a compile profile to this file (single process only)")
+	parser.add_argument("-s","--source",default = getPath("music"),help = "music source tree")
+	parser.add_argument("-o","--target",default = getPath("agkbanjo","media","music"),help = "compiled library")
+	args = parser.parse_args()
+	for step in [x for x in args.steps if x not in BuildCommand.STEPS]:
+		parser.error("unknown step "+step)
+	errors = BuildCommand(args).run()
+	for e in errors:
+		print("Error : "+e)
+	sys.exit(0 if len(errors) == 0 else 1)
@@ -1,4 +1,5 @@
 @echo off
-python buildtree.py
-python buildindex.py
+pushd ..
+python -m clawhammer
+popd
 ..\agkbanjo\agkbanjo
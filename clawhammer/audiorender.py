@@ -0,0 +1,188 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		audiorender.py
+#		Purpose:	Render compiled tunes to .wav files without the player
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,re,json,time,wave,hashlib,argparse
+import numpy
+from .tune import *
+from .events import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		Decoded note samples, by sample id (tuning + fret) or "metronome", loaded from the
+#		player's sounds directory the first time they are used and kept for later tunes.
+#
+# ***************************************************************************************************
+
+class SampleCache(object):
+	def __init__(self,soundDirectory = None,rate = 44100):
+		self.soundDirectory = soundDirectory if soundDirectory is not None else getPath("agkbanjo","media","sounds")
+		self.rate = rate
+		self.samples = {}
+	#
+	def get(self,sampleID):
+		if sampleID not in self.samples:
+			self.samples[sampleID] = self.load(self.soundDirectory+os.sep+"{0}.ogg".format(sampleID))
+		return self.samples[sampleID]
+	#
+	#		Load as mono float32 at the cache's rate.
+	#
+	def load(self,fileName):
+		import soundfile 															# only needed to decode.
+		if not os.path.exists(fileName):
+			raise MusicException("No sample "+fileName)
+		data,rate = soundfile.read(fileName,dtype = "float32",always_2d = True)
+		data = data.mean(axis = 1)
+		if rate != self.rate:														# linear resample
+			count = int(len(data) * self.rate / rate)
+			data = numpy.interp(numpy.arange(count) * rate / self.rate,numpy.arange(len(data)),data)
+		return data.astype(numpy.float32)
+
+# ***************************************************************************************************
+#
+#		Renders .plux text (or a compiled tune) the way player.agc plays it, using the tune's
+#		event table. Samples are not cut off, as in the player.
+#
+# ***************************************************************************************************
+
+class TuneAudioRenderer(object):
+	def __init__(self,samples = None,gain = 0.5,metronome = True):
+		self.samples = samples if samples is not None else SampleCache()
+		self.gain = gain
+		self.metronome = metronome
+	#
+	#		Read .plux text into keys and bar strings.
+	#
+	def readPlux(self,text):
+		keys = dict(ClawhammerTune.DEFAULTS)
+		bars = []
+		for line in text.replace("\r","").split("\n"):
+			if line.startswith(".") and line.find(":=") >= 0:
+				keys[line[1:line.find(":=")]] = line[line.find(":=")+2:]
+			elif line.startswith("|"):
+				bars.append(line[1:])
+		return keys,bars
+	#
+	#		Get the sample ids and start times in seconds of everything played, from the event
+	#		table.
+	#
+	def schedule(self,keys,bars,tempo = None):
+		keys = dict(keys)
+		keys["tempo"] = str(tempo) if tempo is not None else keys["tempo"]
+		notes = []
+		for b in range(0,len(bars)):
+			for h,note in enumerate(bars[b].split(".")[:EventTable.getNotesInBar(keys)]):
+				for m in TuneAudioRenderer.PLUCK.finditer(note):
+					fret = ord(m.group(2)) - 97
+					modifier = m.group(3) or ""
+					change = len(modifier) * (-1 if modifier.startswith("-") else 1)
+					notes.append((b,h,int(m.group(1)),fret,None if change == 0 else fret + change))
+		table = EventTable.fromNotes(keys,notes,len(bars))
+		return self.getArrays(table,len(bars) * ClawhammerTune.getNumber(keys,"beats") * 60.0 / ClawhammerTune.getNumber(keys,"tempo"))
+	#
+	def getArrays(self,table,length):
+		ids = numpy.frombuffer(table.samples,dtype = numpy.int16).astype(numpy.int64)
+		times = numpy.frombuffer(table.times,dtype = numpy.float64) / 1000.0
+		if not self.metronome:
+			keep = numpy.frombuffer(table.kinds,dtype = numpy.int8) != EventTable.METRONOME
+			ids,times = ids[keep],times[keep]
+		return ids,times,length
+	#
+	#		Mix the samples. Each sample is added at all its start positions in one go, in
+	#		blocks to keep the index arrays small.
+	#
+	def mix(self,ids,times,length):
+		rate = self.samples.rate
+		starts = numpy.round(times * rate).astype(numpy.int64)
+		sounds = { i:self.samples.get("metronome" if i < 0 else i) for i in numpy.unique(ids).tolist() }
+		total = max([int(length * rate)] + [starts[ids == i].max() + len(s) for i,s in sounds.items()])
+		output = numpy.zeros(total,dtype = numpy.float64)
+		for i,sound in sounds.items():
+			positions = starts[ids == i]
+			block = max(1,TuneAudioRenderer.BLOCK // max(1,len(sound)))
+			offsets = numpy.arange(len(sound),dtype = numpy.int64)
+			for n in range(0,len(positions),block):
+				index = (positions[n:n+block,None] + offsets).ravel()
+				weights = numpy.tile(sound,len(positions[n:n+block]))
+				output += numpy.bincount(index,weights = weights,minlength = total)
+		return numpy.clip(output * self.gain,-1.0,1.0).astype(numpy.float32)
+	#
+	#		Render a .plux file or a compiled tune to samples.
+	#
+	def render(self,source,tempo = None):
+		return self.renderText(source.renderText() if isinstance(source,ClawhammerTune) else open(source).read(),tempo)
+	#
+	def renderText(self,text,tempo = None):
+		keys,bars = self.readPlux(text)
+		return self.mix(*self.schedule(keys,bars,tempo))
+	#
+	def write(self,source,fileName,tempo = None):
+		data = self.render(source,tempo)
+		pcm = (data * 32767).astype("<i2").tobytes()
+		h = wave.open(fileName,"wb")
+		h.setnchannels(1)
+		h.setsampwidth(2)
+		h.setframerate(self.samples.rate)
+		h.writeframes(pcm)
+		h.close()
+		return len(data) / self.samples.rate,hashlib.sha1(pcm).hexdigest()
+	#
+	#		Render every .plux in a tree to .wav files in a matching tree. Returns a dictionary
+	#		of source path to PCM hash, for regression checks.
+	#
+	def renderTree(self,sourceDir,targetDir):
+		hashes = {}
+		for root,dirs,files in os.walk(sourceDir):
+			dirs.sort()
+			for f in sorted(files):
+				if f.endswith(".plux") and not f.startswith("__"):
+					target = targetDir+root[len(sourceDir):]
+					if not os.path.exists(target):
+						os.makedirs(target)
+					start = time.perf_counter()
+					seconds,hash = self.write(root+os.sep+f,target+os.sep+f[:-5]+".wav")
+					elapsed = time.perf_counter()-start
+					print("Rendered {0} ({1:.0f}s) in {2:.2f}s, {3:.0f}x real time".format(f,seconds,elapsed,seconds/max(elapsed,1e-6)))
+					hashes[(root[len(sourceDir):]+os.sep+f).replace(os.sep,"/").lstrip("/")] = hash
+		return hashes
+
+TuneAudioRenderer.PLUCK = re.compile("([1-5])([a-z])(\\++|\\-+|\\/+)?")
+TuneAudioRenderer.BLOCK = 1 << 22 															# samples mixed at once
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Render .plux tunes to .wav")
+	parser.add_argument("files",nargs = "*",help = ".plux or .claw files to render")
+	parser.add_argument("-o","--output",default = ".",help = "directory for .wav files")
+	parser.add_argument("-a","--all",action = "store_true",help = "render the whole music library")
+	parser.add_argument("-t","--tempo",type = int,help = "override tempo")
+	parser.add_argument("-m","--no-metronome",action = "store_true",help = "leave out the metronome")
+	parser.add_argument("-c","--check",help = "compare library renders with this hash file, create it if missing")
+	args = parser.parse_args()
+	renderer = TuneAudioRenderer(metronome = not args.no_metronome)
+	try:
+		for f in args.files:
+			source = ClawhammerTune(f) if f.endswith(".claw") else f
+			target = args.output+os.sep+os.path.splitext(os.path.basename(f))[0]+".wav"
+			seconds,hash = renderer.write(source,target,args.tempo)
+			print("Rendered {0} ({1:.0f}s)".format(target,seconds))
+		if args.all or args.check is not None:
+			hashes = renderer.renderTree(getPath("agkbanjo","media","music"),args.output)
+			if args.check is not None and os.path.exists(args.check):
+				previous = json.load(open(args.check))
+				changed = sorted([k for k in set(hashes.keys()) | set(previous.keys()) if hashes.get(k) != previous.get(k)])
+				for k in changed:
+					print("Changed : "+k)
+				sys.exit(0 if len(changed) == 0 else 1)
+			elif args.check is not None:
+				json.dump(hashes,open(args.check,"w"),indent = 1,sort_keys = True)
+	except MusicException as e:
+		print("Error : "+e.getMessage())
+		sys.exit(1)
@@ -9,8 +9,10 @@
 # ***************************************************************************************************
 # ***************************************************************************************************
 
-import re,random
-from musicex import *
+import re,random,array
+from .musicex import *
+from .lexer import *
+from .profiler import *
 
 # ***************************************************************************************************
 #
@@ -19,10 +21,29 @@ from musicex import *
 # ***************************************************************************************************
 
 class Pluck(object):
-	def __init__(self,fret,string):
-		self.fret = fret
-		self.string = string 
-		self.isModified = False
+	__slots__ = ("bar","cell")
+	#
+	#		A pluck is a view of one cell (half note * 5 + string - 1) of the bar's storage
+	#
+	def __init__(self,bar,cell):
+		self.bar = bar
+		self.cell = cell
+	#
+	@property
+	def fret(self):
+		return self.bar.frets[self.cell]
+	@property
+	def string(self):
+		return self.cell % 5 + 1
+	@property
+	def isModified(self):
+		return self.bar.modifiers[self.cell] != Pluck.NONE
+	@property
+	def isSlide(self):
+		return self.bar.modifiers[self.cell] == Pluck.SLIDE
+	@property
+	def endFret(self):
+		return self.bar.endFrets[self.cell]
 	#
 	def getFretting(self):
 		return self.endFret if self.isModified else self.fret
@@ -30,15 +51,21 @@ class Pluck(object):
 		return self.string
 	#
 	def setModify(self,isSlide,endFret):
-		self.isModified = True
-		self.isSlide = isSlide
-		self.endFret = endFret
+		self.bar.modifiers[self.cell] = Pluck.SLIDE if isSlide else Pluck.HAMMER
+		self.bar.endFrets[self.cell] = endFret
 	#
 	def render(self):
-		base = str(self.string)+chr(self.fret+97)
-		if self.isModified:
-			c = "/" if self.isSlide else ("+" if self.endFret > self.fret else "-")
-			base = base + c * abs(self.endFret-self.fret)
+		return Pluck.encode(self.string,self.fret,self.bar.modifiers[self.cell],self.endFret)
+	#
+	#		.plux text for a pluck on a string (1-5), the string, the fret as a letter and for
+	#		a modified pluck a / + or - for each fret moved to the end fret.
+	#
+	@staticmethod
+	def encode(string,fret,modifier,endFret):
+		base = str(string)+chr(fret+97)
+		if modifier != Pluck.NONE:
+			c = "/" if modifier == Pluck.SLIDE else ("+" if endFret > fret else "-")
+			base = base + c * abs(endFret-fret)
 		return base
 	#
 	def toString(self):
@@ -46,6 +73,21 @@ class Pluck(object):
 		if self.isModified:
 			s = s + ("/" if self.isSlide else "-")+str(self.endFret)
 		return s + "."+str(self.string)
+	#
+	#		The pluck as a tab cell. Cells are made once for each different pluck and kept.
+	#
+	def toCell(self):
+		key = (self.bar.frets[self.cell],self.bar.modifiers[self.cell],self.bar.endFrets[self.cell],self.cell % 5)
+		cell = Pluck.CELLS.get(key)
+		if cell is None:
+			cell = Pluck.CELLS[key] = Bar.padCell(self.toString(),"-")
+		return cell
+
+Pluck.EMPTY = 0xFF																# fret value for no pluck
+Pluck.NONE = 0																	# modifiers
+Pluck.HAMMER = 1 																# hammer on or pull off
+Pluck.SLIDE = 2
+Pluck.CELLS = {} 																# tab cells by fret,modifier,end,string
 
 # ***************************************************************************************************
 #
@@ -55,85 +97,97 @@ class Pluck(object):
 
 class Bar(Exception):
 	#
-	def __init__(self,barNumber,descriptor,keys = {},notes = 4):
+	def __init__(self,barNumber,descriptor,keys = {},notes = 4,chordTable = None,rng = None):
 		self.descriptor = descriptor										# Save standards
 		self.barNumber = barNumber
 		self.notes = notes
 		self.keys = keys
+		self.chordTable = chordTable 										# chord frettings, built on demand
+		self.rng = rng if rng is not None else random 						# random source for @s @f
 		self.alternateDescriptor = None 									# Alternate description
 		self.generate([0,0,0,0,0])											# Create it.
 	#
+	#		Create another bar with the same compiled content but a different number.
+	#
+	def share(self,barNumber):
+		if barNumber == self.barNumber:
+			return self
+		bar = Bar.__new__(Bar)
+		bar.__dict__.update(self.__dict__)
+		bar.barNumber = barNumber
+		return bar
+	#
 	#		Create a bar array.
 	#
 	def generate(self,startFretting):
-		MusicException.Number = self.barNumber 								# set up for errors
 		self.pos = 0 														# current beat position.
-		self.pluckCount = [ 0 ] * (self.notes * 2)							# Plucks in each half note
+		cells = self.notes * 2 * 5 											# half notes x strings 1-5
+		self.pluckCount = array.array("H",[0]) * (self.notes * 2)			# Plucks in each half note
 		self.chords = [ None ] * (self.notes * 2)							# Chords here.
-		self.plucks = []													# Actual plucks each half note
+		self.brushes = bytearray(self.notes * 2)							# Non zero if brushed here.
+		self.frets = bytearray([Pluck.EMPTY]) * cells						# Fret of each pluck
+		self.modifiers = bytearray(cells)									# Hammer/Slide modifier
+		self.endFrets = bytearray(cells)									# Modified fret
 		self.startFretting = [x for x in startFretting]						# initial fretting.		
-		for i in range(0,self.notes*2):
-			self.plucks.append([None,None,None,None,None])					# strings 1-5 offset by 1
+		self.frettingAt = [] 												# fretting after each half note
+		self.frettingEnd = 0 												# half notes with anything in
 		definition = self.descriptor 										# get the descriptor.
 		if self.alternateDescriptor is not None:
 			definition = self.alternateDescriptor
 		definition = definition.replace("\t"," ").strip().lower()			# preprocess.
-		while definition != "":												# process everything.
-			definition = self.processDefinition(definition).strip()			# until done
+		if definition != "":
+			while definition.find("@") >= 0:								# expand randoms
+				definition = self.processRandoms(definition)
+			try:
+				for token in BarLexer(definition).tokens():					# process everything.
+					self.processToken(token)
+			except MusicException as e:
+				if e.index is None:											# tag error with bar number
+					e.index = self.barNumber
+				raise
+		self.frettingAt = [] 												# only needed while building
 	#
-	#		Process one element
+	#		Process one token
 	#
-	def processDefinition(self,d):
+	def processToken(self,token):
+		kind = token.kind
 		#
-		while d.find("@") >= 0:
-			d = self.processRandoms(d)
-		# 
-		if d.startswith("&"):												# & rest
+		if kind == BarToken.REST:											# & rest
 			self.pos += 2
-			return d[1:]
 		#
-		if d.startswith("-"):
+		elif kind == BarToken.BACK:
 			self.pos -= 1
-			return d[1:]
 		#
-		if d.startswith("."):												# . pluck
+		elif kind == BarToken.DRONE:										# . pluck
 			if self.pos == 0 or self.pos > self.notes*2:
 				raise MusicException("Cannot put pluck here")
-			self.plucks[self.pos-1][4] = Pluck(0,5)
-			return d[1:]
+			self.setPluck(self.pos-1,5,0)
+			self.touch(self.pos-1)
 		#
-		if d.startswith("!"):												# ! pling.
+		elif kind == BarToken.BRUSH:										# ! pling.
 			self.createBrush()
 			self.pos += 2
-			return d[1:]
 		#
-		m = re.match("^\\((.*?)\\)(.*)$",d)									# (chord)
-		if m is not None:
+		elif kind == BarToken.CHORD:										# (chord)
 			if self.pos >= self.notes*2:
 				raise MusicException("Cannot put chord here")
-			if "chord_"+m.group(1) not in self.keys:
-				raise MusicException("Unknown chord '{0}'".format(m.group(1)))
-			self.chords[self.pos] = m.group(1)
-			return m.group(2)
+			if "chord_"+token.value not in self.keys:
+				raise MusicException("Unknown chord '{0}'".format(token.value))
+			self.chords[self.pos] = token.value
+			self.touch(self.pos)
 		#
-		m = re.match("^(x*)(["+Bar.FRETTING+"]+)(.*)$",d)					# xxxfff fretting.
-		if m is not None:
-			self.writePlucks(1+len(m.group(1)),m.group(2))					# output it.
+		elif kind == BarToken.NOTES:										# xxxfff fretting.
+			self.writePlucks(token.string,token.value)						# output it.
 			self.pos += 2 													# advance.
-			return m.group(3)
-		#
-		m = re.match("^([hp\\/])(["+Bar.FRETTING+"])(.*)$",d)				# [HP/][Fret]
-		if m is not None:
-			self.modifyLastFret(m.group(1) == "/",Bar.FRETTING.find(m.group(2)))
-			return m.group(3)
 		#
-		raise MusicException("Do not understand '{0}'".format(d))
+		elif kind == BarToken.MODIFY:										# [HP/][Fret]
+			self.modifyLastFret(token.isSlide(),token.value)
 	#
 	#		Process random operation
 	#
 	def processRandoms(self,s):
-		s = s.replace("@s","xxxx"[0:random.randint(0,3)],1)
-		s = s.replace("@f",str(random.randint(0,5)),1)
+		s = s.replace("@s","xxxx"[0:self.rng.randint(0,3)],1)
+		s = s.replace("@f",str(self.rng.randint(0,5)),1)
 		return s
 	#
 	#		Write Notes
@@ -147,8 +201,9 @@ class Bar(Exception):
 			fretID = Bar.FRETTING.find(f)									# convert and check
 			if fretID < 0:
 				raise MusicException("Bad fretting '{0}'".format(frets))				
-			self.plucks[self.pos][string-1] = Pluck(fretID,string)			# add to music.
+			self.setPluck(self.pos,string,fretID)							# add to music.
 			self.pluckCount[self.pos] += 1
+			self.touch(self.pos)
 			string += 1
 	#
 	#		Modify the last fret
@@ -157,64 +212,136 @@ class Bar(Exception):
 		if self.pos == 0 or self.pluckCount[self.pos-2] != 1:				# must be one note.
 			raise MusicException("Previous note must be one pluck only")
 		for s in range(0,5):												# find the one to slide
-			if self.plucks[self.pos-2][s] is not None:
-				self.plucks[self.pos-2][s].setModify(isSlide,endPosition)
+			cell = (self.pos-2)*5+s
+			if self.frets[cell] != Pluck.EMPTY:
+				self.modifiers[cell] = Pluck.SLIDE if isSlide else Pluck.HAMMER
+				self.endFrets[cell] = endPosition
+		self.touch(self.pos-2)
 	#
 	#		Create a brush here.
 	#
 	def createBrush(self):
+		if self.pos >= self.notes * 2:										# no space
+			raise MusicException("Bar overflow")
 		brushFretting = self.getCurrentEndFretting()						# fretting here
-		self.plucks[self.pos] = [ None,None,None,None,None ]				# erase anything here.
+		for s in range(0,5):												# erase anything here.
+			self.frets[self.pos*5+s] = Pluck.EMPTY
+			self.modifiers[self.pos*5+s] = Pluck.NONE
 		for s in range(0,3):												# copy plucks in.
-			self.plucks[self.pos][s] = Pluck(brushFretting[s],s+1)
+			self.setPluck(self.pos,s+1,brushFretting[s])
+		self.brushes[self.pos] = 1
+		self.touch(self.pos)
+	#
+	#		Put a pluck in the storage, replacing anything there.
 	#
-	#		Get the fretting at the current end point.
+	def setPluck(self,pos,string,fret):
+		cell = pos*5+string-1
+		self.frets[cell] = fret
+		self.modifiers[cell] = Pluck.NONE
+		self.endFrets[cell] = 0
+	#
+	#		Fretting after a cell is played, None if empty.
+	#
+	def getFretting(self,cell):
+		if self.frets[cell] == Pluck.EMPTY:
+			return None
+		return self.endFrets[cell] if self.modifiers[cell] != Pluck.NONE else self.frets[cell]
+	#
+	#		Access plucks as views, None if nothing on that string. pos is the half note, string
+	#		is 0-4.
+	#
+	def getPluck(self,pos,string):
+		cell = pos*5+string
+		return None if self.frets[cell] == Pluck.EMPTY else Pluck(self,cell)
+	@property
+	def plucks(self):
+		return [[self.getPluck(p,s) for s in range(0,5)] for p in range(0,self.notes*2)]
+	#
+	#		Half note p has changed, so the fretting from there on must be worked out again.
+	#
+	def touch(self,p):
+		p = p % (self.notes * 2)											# negative positions wrap
+		if p < len(self.frettingAt):
+			del self.frettingAt[p:]
+		self.frettingEnd = max(self.frettingEnd,p+1)
+	#
+	#		Get the fretting at the current end point. Only half notes changed since the last
+	#		call are rescanned.
 	#
 	def getCurrentEndFretting(self):
-		fretting = [x for x in self.startFretting]							# start with this.
-		for i in range(0,self.notes * 2):									# check all including this (for chord)
-			if self.pluckCount[i] != 0:										# only if something here.
-				overwrite = False
-				for s in range(0,4):										# check for overwriting
-					if self.plucks[i][s] is not None:						# some pluck here.
-						newNote = self.plucks[i][s].getFretting()			# changed to ...
-						if newNote != fretting[s]:							# if changed overwrite all
-							overwrite = True
-				if overwrite:												# if overwritten do everything
-					fretting = [self.plucks[i][s].getFretting() if self.plucks[i][s] is not None else 0 for s in range(0,5)]
-			if self.chords[i] is not None:									# chord.
-				chord = self.keys["chord_"+self.chords[i]]+"0"				# get chord and check it
-				if len(chord) != 5 or re.match("^["+Bar.FRETTING+"]+$",chord) is None:		
-					raise MusicException("Bad chord definition "+self.chords[i])					
-				fretting = [Bar.FRETTING.find(c) for c in chord] 			# update current					
+		with CompileProfiler.phase("endfretting"):
+			fretting = self.frettingAt[-1] if len(self.frettingAt) != 0 else self.startFretting
+			for i in range(len(self.frettingAt),self.frettingEnd):			# check all including this (for chord)
+				fretting = self.advanceFretting(fretting,i)
+				self.frettingAt.append(fretting)
+			return [x for x in fretting]
+	#
+	#		Work out the fretting after half note i
+	#
+	def advanceFretting(self,fretting,i):
+		if self.pluckCount[i] != 0:											# only if something here.
+			current = [self.getFretting(i*5+s) for s in range(0,5)]		# what's here, None if nothing
+			for s in range(0,4):											# check for overwriting
+				if current[s] is not None and current[s] != fretting[s]:
+					fretting = [x if x is not None else 0 for x in current]
+					break													# if changed overwrite all
+		if self.chords[i] is not None:										# chord.
+			if self.chordTable is None:
+				self.chordTable = Bar.createChordTable(self.keys)
+			fretting = self.chordTable[self.chords[i]]
+			if fretting is None:
+				raise MusicException("Bad chord definition "+self.chords[i])
 		return fretting
 	#
+	#		Convert chord_<name> keys to frettings, None if the definition is bad.
+	#
+	@staticmethod
+	def createChordTable(keys):
+		table = {}
+		for k in keys.keys():
+			if k.startswith("chord_"):
+				chord = keys[k]+"0"
+				valid = len(chord) == 5 and re.match("^["+Bar.FRETTING+"]+$",chord) is not None
+				table[k[6:]] = [Bar.FRETTING.find(c) for c in chord] if valid else None
+		return table
+	#
 	#		Render
 	#
 	def render(self):
 		return ".".join([self.__render(x) for x in range(0,self.notes*2)])
 	def __render(self,p):
-		return "".join([x.render() if x is not None else "" for x in self.plucks[p]])
+		return "".join([Pluck(self,c).render() for c in range(p*5,p*5+5) if self.frets[c] != Pluck.EMPTY])
 	#
 	#		Convert to string
 	#
 	def toString(self):
-		return "\n".join([str(x+1)+self.__toString(x) for x in range(-1,5)])
+		rows = self.getTabRows()
+		return "\n".join([str(x)+"|"+rows[x]+"|" for x in range(0,6)])
+	#
+	#		Tab rows without the string number or bar lines, chords then strings 1-5.
+	#
+	def getTabRows(self):
+		return [self.__toString(x) for x in range(-1,5)]
 	def __toString(self,s):
-		return "|"+"".join([self.__toString2(hb,s) for hb in range(0,self.notes*2)])+"|"
+		return "".join([self.__toString2(hb,s) for hb in range(0,self.notes*2)])
 	def __toString2(self,pos,s):
 		if s < 0:
 			s = "" if self.chords[pos] is None else self.chords[pos][0].upper()+self.chords[pos][1:].lower()
-			pad = " "
-		else:
-			pluck = self.plucks[pos][s]
-			s = "." if pluck is None else pluck.toString()
-			pad = "-"
-		while len(s) < 9:
-			s = pad+s+pad
+			return Bar.padCell(s," ")
+		pluck = self.getPluck(pos,s)
+		return Bar.EMPTYCELL if pluck is None else pluck.toCell()
+	#
+	#		Centre text in a 9 character cell, cutting off the right if too long.
+	#
+	@staticmethod
+	def padCell(s,pad):
+		if len(s) < 9:
+			k = (10 - len(s)) // 2
+			s = pad*k+s+pad*k
 		return s[:9]
 
-Bar.FRETTING = "0123456789nlwtufsv"											# Fret representations
+Bar.FRETTING = BarLexer.FRETTING												# Fret representations
+Bar.EMPTYCELL = Bar.padCell(".","-")											# tab cell with no pluck
 
 if __name__ == "__main__":
 	b = Bar(1,"5 & x2P0 xx3.")
@@ -0,0 +1,208 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		benchmark.py
+#		Purpose:	Compiler benchmarks on generated tunes
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,io,json,time,random,shutil,tempfile,tracemalloc,argparse,contextlib
+from .tune import *
+from .buildtree import *
+
+# ***************************************************************************************************
+#
+#		Generates random but valid .claw source. Uses its own seeded generator so the same seed
+#		always gives the same corpus.
+#
+# ***************************************************************************************************
+
+class CorpusGenerator(object):
+	def __init__(self,seed = 42):
+		self.random = random.Random(seed)
+	#
+	#		Create one bar descriptor of the given number of beats, with chords, brushes, drones,
+	#		hammer ons, pull offs, slides and back steps.
+	#
+	def createBar(self,beats = 4):
+		parts = []
+		pos = 0
+		while pos < beats * 2:
+			r = self.random.random()
+			if r < 0.15:														# brush
+				parts.append("!")
+				pos += 2
+			elif r < 0.25:														# rest
+				parts.append("&")
+				pos += 2
+			elif r < 0.32:														# chord, brush
+				parts.append("("+self.random.choice(sorted(CorpusGenerator.CHORDS.keys()))+")!")
+				pos += 2
+			else:
+				if pos > 0 and self.random.random() < 0.1:						# half beat back
+					parts.append("-")
+					pos -= 1
+				string = self.random.randint(1,5)
+				count = self.random.randint(1,min(3,6-string))
+				parts.append("x"*(string-1)+"".join([self.random.choice(Bar.FRETTING[:8]) for i in range(0,count)]))
+				if count == 1 and self.random.random() < 0.3:					# hammer, pull off, slide
+					parts[-1] += self.random.choice("hp/")+self.random.choice(Bar.FRETTING[:8])
+				pos += 2
+				if pos <= beats * 2 and self.random.random() < 0.2:				# drone
+					parts.append(".")
+		return " ".join(parts)
+	#
+	#		Create a tune with the given number of bars, about a quarter from macros.
+	#
+	def createTune(self,bars,beats = 4):
+		lines = [ "// generated","tempo := {0}".format(self.random.randint(40,160)),"beats := {0}".format(beats) ]
+		lines += [ "chord_{0} := {1}".format(c,CorpusGenerator.CHORDS[c]) for c in CorpusGenerator.CHORDS ]
+		lines += [ "parta := "+" | ".join([self.createBar(beats) for i in range(0,4)]) ]
+		lines += [ "partb := "+" | ".join([self.createBar(beats) for i in range(0,4)]) ]
+		while bars > 0:
+			if bars >= 4 and self.random.random() < 0.25:
+				lines.append(self.random.choice(["{parta}","{partb}"]))
+				bars -= 4
+			else:
+				count = min(bars,4)
+				lines.append(" | ".join([self.createBar(beats) for i in range(0,count)]))
+				bars -= count
+		return "\n".join(lines)+"\n"
+	#
+	#		Write a corpus of tunes totalling the given number of bars.
+	#
+	def createCorpus(self,directory,bars,barsPerTune = 200):
+		n = 0
+		while bars > 0:
+			count = min(bars,barsPerTune)
+			folder = directory+os.sep+"set{0:03}".format(n // 50)
+			if not os.path.exists(folder):
+				os.makedirs(folder)
+			open(folder+os.sep+"tune{0:05}.claw".format(n),"w").write(self.createTune(count))
+			bars -= count
+			n += 1
+
+CorpusGenerator.CHORDS = { "c":"2010","g":"0000","d":"0234","f":"3211","am":"2210" }
+
+# ***************************************************************************************************
+#
+#		Runs the benchmarks. Each result records seconds (best of several runs for small
+#		sizes), items per second and peak traced memory.
+#
+# ***************************************************************************************************
+
+class Benchmark(object):
+	def __init__(self,seed = 42):
+		self.seed = seed
+		self.results = {}
+		self.workDirectory = tempfile.mkdtemp(prefix = "clawbench")
+	#
+	def run(self,sizes):
+		try:
+			for size in sizes:
+				self.benchmarkBars(size,4)
+				self.benchmarkBars(size,64)
+				self.benchmarkTune(size)
+				self.benchmarkBuild(size)
+		finally:
+			shutil.rmtree(self.workDirectory)
+		return self.results
+	#
+	#		Bar parsing, normal and long bars. Long bars are fewer so the number of beats is the
+	#		same.
+	#
+	def benchmarkBars(self,size,beats):
+		generator = CorpusGenerator(self.seed)
+		keys = { "chord_"+c:CorpusGenerator.CHORDS[c] for c in CorpusGenerator.CHORDS }
+		chordTable = Bar.createChordTable(keys)
+		count = max(1,size * 4 // beats)
+		descriptors = [generator.createBar(beats) for i in range(0,count)]
+		self.measure("bar.beats{0}".format(beats),count,lambda: [Bar(i,descriptors[i],keys,beats,chordTable) for i in range(0,count)])
+	#
+	#		Tune construction and render.
+	#
+	def benchmarkTune(self,size):
+		source = self.workDirectory+os.sep+"tune.claw"
+		open(source,"w").write(CorpusGenerator(self.seed).createTune(size))
+		tune = self.measure("tune.construct",size,lambda: ClawhammerTune(source))
+		self.measure("tune.render",size,lambda: tune.renderText())
+	#
+	#		Full tree build from clean.
+	#
+	def benchmarkBuild(self,size):
+		sourceDir = self.workDirectory+os.sep+"music"
+		targetDir = self.workDirectory+os.sep+"media"
+		CorpusGenerator(self.seed).createCorpus(sourceDir,size)
+		def build():
+			shutil.rmtree(targetDir,ignore_errors = True)
+			os.makedirs(targetDir)
+			with contextlib.redirect_stdout(io.StringIO()):
+				MusicBuilder().buildTree(sourceDir,targetDir)
+		self.measure("build.tree",size,build)
+		shutil.rmtree(sourceDir)
+		shutil.rmtree(targetDir)
+	#
+	#		Time and trace a function. Returns its result.
+	#
+	def measure(self,name,size,function):
+		repeats = 3 if size <= 10000 else 1
+		best = None
+		for i in range(0,repeats):
+			start = time.perf_counter()
+			result = function()
+			elapsed = time.perf_counter()-start
+			best = elapsed if best is None else min(best,elapsed)
+		tracemalloc.start()
+		function()
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+		key = "{0}.{1}".format(name,size)
+		self.results[key] = { "seconds":best,"perSecond":size / max(best,1e-9),"peakBytes":peak }
+		print("{0:<28} {1:>10.4f}s {2:>12.0f}/s {3:>12} bytes".format(key,best,size/max(best,1e-9),peak))
+		return result
+
+# ***************************************************************************************************
+#
+#		Compare results with a baseline, returns a list of regressions. Very short timings are
+#		too noisy to compare.
+#
+# ***************************************************************************************************
+
+class BenchmarkComparer(object):
+	def compare(self,results,baseline,tolerance = 0.25,minimumTime = 0.01):
+		regressions = []
+		for key in sorted(results.keys()):
+			if key in baseline:
+				new = results[key]
+				old = baseline[key]
+				if old["seconds"] >= minimumTime and new["seconds"] > old["seconds"] * (1+tolerance):
+					regressions.append("{0} time {1:.4f}s was {2:.4f}s".format(key,new["seconds"],old["seconds"]))
+				if new["peakBytes"] > old["peakBytes"] * (1+tolerance):
+					regressions.append("{0} memory {1} bytes was {2}".format(key,new["peakBytes"],old["peakBytes"]))
+		return regressions
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Benchmark the clawhammer compiler")
+	parser.add_argument("-s","--sizes",type = int,nargs = "+",default = [10,100,1000,10000],help = "bar counts to test, up to 1000000")
+	parser.add_argument("-o","--output",default = "benchmark.json",help = "results file")
+	parser.add_argument("-b","--baseline",default = "benchmark_baseline.json",help = "baseline to compare against")
+	parser.add_argument("-t","--tolerance",type = float,default = 0.25,help = "allowed slow down, 0.25 = 25%")
+	parser.add_argument("--save-baseline",action = "store_true",help = "save the results as the new baseline")
+	parser.add_argument("--seed",type = int,default = 42,help = "corpus generator seed")
+	args = parser.parse_args()
+	results = Benchmark(args.seed).run(args.sizes)
+	json.dump(results,open(args.output,"w"),indent = 1,sort_keys = True)
+	if args.save_baseline:
+		json.dump(results,open(args.baseline,"w"),indent = 1,sort_keys = True)
+		print("Saved baseline "+args.baseline)
+	elif os.path.exists(args.baseline):
+		regressions = BenchmarkComparer().compare(results,json.load(open(args.baseline)),args.tolerance)
+		for r in regressions:
+			print("Regression : "+r)
+		sys.exit(0 if len(regressions) == 0 else 1)
+	else:
+		print("Warning : no baseline "+args.baseline+", run with --save-baseline to create it")
+		sys.exit(1)
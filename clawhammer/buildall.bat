@@ -1,3 +1,4 @@
 @echo off
-python buildtree.py
-python buildindex.py
+pushd ..
+python -m clawhammer
+popd
@@ -9,7 +9,12 @@
 # ***************************************************************************************************
 # ***************************************************************************************************
 
-import re,os,sys,shutil
+import os,sys,json
+if not __package__:													# run as a script, e.g. python buildindex.py
+	sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	import clawhammer
+	__package__ = "clawhammer"
+from . import getPath
 
 # ***************************************************************************************************
 #								Index building class
@@ -17,27 +22,100 @@ import re,os,sys,shutil
 
 class BuildIndex(object):
 
-	def build(self,baseDirectory):
-
-		for root,dirs,files in os.walk(baseDirectory):
-			files = [x for x in files if x.endswith(".plux") and not x.startswith("__") and not x.endswith(".txt")]
-			dirs = [x for x in dirs if not x.startswith("__")]
-			files.sort()
-			dirs.sort()
-			self.buildOneIndex(baseDirectory,root,files,dirs)
+	#
+	#		Build every index and the catalog. listing is the tree as os.walk() gives it, if it
+	#		has already been walked.
+	#
+	def build(self,baseDirectory,listing = None):
+		tunes = []
+		for root,dirs,files in (listing if listing is not None else os.walk(baseDirectory)):
+			files = self.buildDirectory(baseDirectory,root,files,dirs)
+			tunes += [(root,f) for f in files]
+		self.buildCatalog(baseDirectory,tunes)
+	#
+	#		Build the index for one directory, listing it if files and dirs not given. Returns
+	#		the tunes in it.
+	#
+	def buildDirectory(self,baseDirectory,root,files = None,dirs = None):
+		if files is None:
+			entries = list(os.scandir(root))
+			files = [x.name for x in entries if x.is_file()]
+			dirs = [x.name for x in entries if x.is_dir()]
+		files = [x for x in files if x.endswith(".plux") and not x.startswith("__") and not x.endswith(".txt")]
+		dirs = [x for x in dirs if not x.startswith("__")]
+		files.sort()
+		dirs.sort()
+		self.buildOneIndex(baseDirectory,root,files,dirs)
+		return files
 
 	def buildOneIndex(self,stem,root,files,dirs):		
 		root = root.replace("\\","/")
 		#print(root,files,dirs)
-		h = open((root+os.sep+"index.txt").replace("/",os.sep),"w")
-		h.write("//\n// "+root+"\n//\n")
+		index = "//\n// "+self.getName(root)+"\n//\n"
 		for f in dirs:
-			h.write(f+"\n")
-			h.write(self.process(f)+" (folder)\n")
+			index += f+"\n"+self.process(f)+" (folder)\n"
 		for f in files:
-			h.write(f+"\n")
-			h.write(self.process(f[:-5])+"\n")
+			index += f+"\n"+self.process(f[:-5])+"\n"
+		self.writeFile((root+os.sep+"index.txt").replace("/",os.sep),index)
+	#
+	#		Build the library catalog, one line per tune giving its file, name, folder, tempo,
+	#		beats, tuning and bar count. Tunes are only read if they have changed since the last
+	#		time, this is tracked in __catalog.json
+	#
+	def buildCatalog(self,baseDirectory,tunes = None):
+		if tunes is None:
+			tunes = []
+			for root,dirs,files in os.walk(baseDirectory):
+				tunes += [(root,f) for f in files if f.endswith(".plux") and not f.startswith("__")]
+		cacheFile = baseDirectory+os.sep+"__catalog.json"
+		cache = json.load(open(cacheFile)) if os.path.exists(cacheFile) else {}
+		newCache = {}
+		catalog = "//\n// Catalog : file|name|folder|tempo|beats|tuning|bars\n//\n"
+		for root,f in sorted(tunes):
+			folder = root[len(baseDirectory):].replace("\\","/").strip("/")
+			if [x for x in folder.split("/") if x.startswith("__")]:	# hidden folder
+				continue
+			stat = os.stat(root+os.sep+f)
+			name = (folder+"/"+f).strip("/")
+			entry = cache.get(name)
+			if entry is None or entry["stamp"] != [stat.st_mtime_ns,stat.st_size]:
+				entry = self.readTune(root+os.sep+f)
+				entry["stamp"] = [stat.st_mtime_ns,stat.st_size]
+			newCache[name] = entry
+			catalog += "|".join([name,self.process(f[:-5]),folder,entry["tempo"],entry["beats"],entry["tuning"],str(entry["bars"])])+"\n"
+		self.writeFile(baseDirectory+os.sep+"catalog.txt",catalog)
+		if newCache != cache:
+			json.dump(newCache,open(cacheFile,"w"),indent = 1,sort_keys = True)
+	#
+	#		Get the information about a tune from its .plux
+	#
+	def readTune(self,fileName):
+		entry = { "tempo":"60","beats":"4","tuning":"gdgbd","bars":0 }
+		for line in open(fileName):
+			if line.startswith(".") and line.find(":=") > 0:
+				key,value = line[1:].strip().split(":=",1)
+				if key in entry:
+					entry[key] = value
+			elif line.startswith("|"):
+				entry["bars"] += 1
+		return entry
+	#
+	#		Write a file only if its contents have changed.
+	#
+	def writeFile(self,fileName,text):
+		if os.path.exists(fileName) and open(fileName).read() == text:
+			return False
+		h = open(fileName,"w")
+		h.write(text)
 		h.close()
+		return True
+
+	#
+	#		Directory as named in an index, from the clawhammer directory so the index is the
+	#		same wherever it is built from.
+	#
+	def getName(self,root):
+		return os.path.relpath(root,os.path.dirname(os.path.abspath(__file__))).replace("\\","/")
 
 	def process(self,s):
 		s = [x for x in s.replace("_"," ").replace("-"," ").split(" ") if x != ""]
@@ -45,5 +123,5 @@ class BuildIndex(object):
 		return " ".join(s)
 
 if __name__ == "__main__":
-	BuildIndex().build("../agkbanjo/media/music")
+	BuildIndex().build(getPath("agkbanjo","media","music"))
 	
\ No newline at end of file
@@ -2,7 +2,7 @@
 # ***************************************************************************************************
 #
 #		Name:		buildtree.py
-#		Purpose:	Build all music entries in music tree and compiles most recently 
+#		Purpose:	Build all music entries in music tree and compiles most recently
 #					changed to test.plux
 #		Date:		25th April 2019
 #		Author:		Paul Robson (paul@robsons.org.uk)
@@ -10,39 +10,206 @@
 # ***************************************************************************************************
 # ***************************************************************************************************
 
-import os,sys
-from tune import *
+import os,sys,argparse
+from concurrent.futures import ProcessPoolExecutor
+if not __package__:													# run as a script, e.g. python buildtree.py
+	sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	import clawhammer
+	__package__ = "clawhammer"
+from .tune import *
+from .manifest import *
+from .pluxbinary import *
+from .events import *
+from .searchindex import *
+from .profiler import *
+from . import getPath
+
+# ***************************************************************************************************
+#		Compile one tune, returns ({ extension:text or bytes },None,search document) or
+#		(None,error messages,None). Runs in a worker. Any other exception is reported as an
+#		error for this tune, so it doesn't stop the rest of the build.
+# ***************************************************************************************************
+
+def compileTune(job):
+	sourceFile,binary,events = job
+	try:
+		tune = ClawhammerTune(sourceFile)
+		outputs = { ".plux":tune.renderText() }
+		if binary:
+			outputs[PluxBinary.EXTENSION] = PluxBinaryWriter().convert(tune)
+		if events:
+			outputs[EventTable.EXTENSION] = EventTable.fromTune(tune).toText()
+		return (outputs,None,SearchIndex.createDocument(tune))
+	except MusicException as e:
+		return (None,e.getMessage().split("\n"),None)
+	except Exception as e:
+		return (None,["{0} : {1} {2}".format(sourceFile,type(e).__name__,e)],None)
+
+# ***************************************************************************************************
+#									Builds a whole music tree
+# ***************************************************************************************************
 
 class MusicBuilder(object):
 
-	def __init__(self):
+	def __init__(self,jobs = 1,binary = False,events = False):
 		self.latestTime = 0
 		self.latestFile = None
+		self.jobs = jobs 												# worker processes, 1 = in process.
+		self.binary = binary 											# also write binary .pluxb
+		self.events = events 											# also write .events tables
 
-	def buildTree(self,sourceDir,targetDir):
+	def open(self,sourceDir,targetDir):
 		self.sourceDir = sourceDir.replace("/",os.sep)
 		self.targetDir = targetDir.replace("/",os.sep)
+		self.manifest = BuildManifest(self.targetDir+os.sep+"__manifest.json")
+		self.search = SearchIndex(self.targetDir+os.sep+SearchIndex.FILENAME)
+		self.sources = {}												# source key => output file
+		self.pending = []												# compiles to do.
+		self.errors = []												# error messages from all tunes.
+		self.listing = None												# target tree after pruning.
+
+	def buildTree(self,sourceDir,targetDir,copyLatest = True):
+		self.open(sourceDir,targetDir)
+		if not os.path.isdir(self.sourceDir):							# don't prune from nothing.
+			self.errors.append("Cannot find music directory "+self.sourceDir)
+			return self.errors
 
 		for root,dirs,files in os.walk(self.sourceDir):
-			for f in files:
+			dirs.sort()
+			for f in sorted(files):
 				target = self.targetDir + root[len(self.sourceDir):]
 				self.buildFile(root,target,f,None)
+		if len(self.sources) == 0:
+			self.errors.append("No tunes in music directory "+self.sourceDir)
+			return self.errors
 
-		if self.latestFile is not None:
-				print("Recompiling "+self.latestFile)
-				f = ClawhammerTune(self.latestFile)
-				f.render(targetDir	,"__test.plux")
+		jobs = [(x[0],self.binary,self.events) for x in self.pending]
+		if self.jobs > 1 and len(jobs) > 1:								# compile the pending tunes
+			with ProcessPoolExecutor(self.jobs) as pool:
+				results = list(pool.map(compileTune,jobs,chunksize = 4))
+		else:
+			results = [compileTune(x) for x in jobs]
+		for i in range(0,len(self.pending)):							# write out in tree order.
+			self.completeFile(self.pending[i],results[i])
+
+		self.prune()
+		self.manifest.save()
+		self.search.save()
+
+		if copyLatest and self.latestFile is not None:					# copy newest to test file.
+			self.updateTest(self.latestFile)
+		return self.errors
+	#
+	#		Compile a single source file, which must be in the tree opened. Returns the output
+	#		file or None if there were errors.
+	#
+	def buildOne(self,sourceFile):
+		self.pending = []
+		self.errors = []
+		sourceDir,fileName = os.path.split(sourceFile)
+		self.buildFile(sourceDir,self.targetDir+sourceDir[len(self.sourceDir):],fileName,None)
+		for pending in self.pending:
+			self.completeFile(pending,compileTune((pending[0],self.binary,self.events)))
+		self.manifest.save()
+		self.search.save()
+		if len(self.errors) != 0:
+			return None
+		self.updateTest(sourceFile)
+		return self.manifest.getOutput(self.sourceKey(sourceFile))
+	#
+	#		Remove the output of a source file that has been deleted.
+	#
+	def removeOne(self,sourceFile):
+		key = self.sourceKey(sourceFile)
+		self.sources.pop(key,None)
+		if self.manifest.getOutput(key) is not None:
+			self.removeOutputs(self.manifest.remove(key))
+			self.search.remove(key)
+			self.manifest.save()
+			self.search.save()
+	#
+	#		Copy a source's output to the test file.
+	#
+	def updateTest(self,sourceFile):
+		output = self.manifest.getOutput(self.sourceKey(sourceFile))
+		if output is not None and ClawhammerTune.writeFile(self.targetDir+os.sep+"__test.plux",open(output).read()):
+			print("Updated __test.plux from "+sourceFile)
 
 	def buildFile(self,sourceDir,targetDir,fileName,override):
 		compiled = False
 		if fileName[-5:] == ".claw":
-			print("Compiling "+fileName)
-			if not os.path.exists(targetDir):
-				os.makedirs(targetDir)
-			compiled = True
-			f = ClawhammerTune(sourceDir+os.sep+fileName)
-			f.render(targetDir)
-			self.update(sourceDir+os.sep+fileName)
+			sourceFile = sourceDir+os.sep+fileName
+			key = self.sourceKey(sourceFile)
+			with CompileProfiler.file(sourceFile,"hash"):
+				hash = BuildManifest.hashFile(sourceFile)
+			output = targetDir+os.sep+fileName[:-5].strip()+".plux"
+			self.sources[key] = output
+			current = self.manifest.isCurrent(key,hash,ClawhammerTune.VERSION) and self.search.has(key)
+			current = current and not MusicBuilder.hasRandoms(sourceFile)	# new randoms every build
+			for extension in self.getExtensions():						# optional outputs missing
+				if not os.path.exists(self.outputFile(output,extension)):
+					current = False
+			if not current:
+				print("Compiling "+fileName)
+				compiled = True
+				self.pending.append((sourceFile,targetDir,key,hash,output))
+			self.update(sourceFile)
+		return compiled
+	#
+	#		Write out a compiled tune, or record its errors
+	#
+	def completeFile(self,pending,result):
+		sourceFile,targetDir,key,hash,output = pending
+		if result[1] is not None:
+			self.errors += result[1]
+			return
+		if not os.path.exists(targetDir):
+			os.makedirs(targetDir)
+		with CompileProfiler.file(sourceFile,"output"):
+			for extension,data in result[0].items():
+				ClawhammerTune.writeFile(self.outputFile(output,extension),data)
+		result[2]["path"] = output[len(self.targetDir):].replace(os.sep,"/").lstrip("/")
+		self.search.update(key,result[2])
+		self.manifest.update(key,hash,ClawhammerTune.VERSION,output)
+	#
+	#		Remove the outputs the manifest has for sources that have gone. Files the manifest
+	#		doesn't know about are left alone. The target tree is then kept in self.listing, as
+	#		os.walk() gives it, so the indexes can be built without walking it again.
+	#
+	def prune(self):
+		for key in self.manifest.getSources():
+			if key not in self.sources:
+				self.removeOutputs(self.manifest.remove(key))
+				self.search.remove(key)
+		self.listing = [(root,list(dirs),files) for root,dirs,files in os.walk(self.targetDir)]
+	#
+	#		Optional outputs, and their file names.
+	#
+	def getExtensions(self):
+		return ([PluxBinary.EXTENSION] if self.binary else []) + ([EventTable.EXTENSION] if self.events else [])
+
+	def outputFile(self,output,extension):
+		return os.path.splitext(output)[0]+extension
+
+	def removeOutputs(self,output):
+		for extension in MusicBuilder.EXTENSIONS:
+			self.removeOutput(self.outputFile(output,extension))
+
+	def removeOutput(self,fileName):
+		if os.path.exists(fileName):
+			print("Removing "+fileName)
+			os.remove(fileName)
+
+	#
+	#		Tunes using @s or @f are compiled every time, so each build plays them differently.
+	#
+	@staticmethod
+	def hasRandoms(fileName):
+		data = open(fileName,"rb").read().lower()
+		return data.find(b"@s") >= 0 or data.find(b"@f") >= 0
+
+	def sourceKey(self,fileName):
+		return fileName[len(self.sourceDir):].replace(os.sep,"/").lstrip("/")
 
 	def update(self,fileName):
 		time = os.stat(fileName).st_mtime
@@ -50,5 +217,22 @@ class MusicBuilder(object):
 			self.latestTime = time
 			self.latestFile = fileName
 
+MusicBuilder.EXTENSIONS = [ ".plux",PluxBinary.EXTENSION,EventTable.EXTENSION ]
+
 if __name__ == "__main__":
-	MusicBuilder().buildTree("../music","../agkbanjo/media/music")
+	parser = argparse.ArgumentParser(description = "Compile the music tree")
+	parser.add_argument("-j","--jobs",type = int,default = 1,help = "worker processes (0 = one per core)")
+	parser.add_argument("-b","--binary",action = "store_true",help = "also write binary .pluxb files")
+	parser.add_argument("-e","--events",action = "store_true",help = "also write .events tables")
+	parser.add_argument("-p","--profile",help = "write a compile profile to this file (single process only)")
+	args = parser.parse_args()
+	profiler = CompileProfiler().start() if args.profile is not None else None
+	builder = MusicBuilder(args.jobs if args.jobs > 0 else os.cpu_count(),args.binary,args.events)
+	errors = builder.buildTree(getPath("music"),getPath("agkbanjo","media","music"))
+	if profiler is not None:
+		profiler.stop()
+		profiler.save(args.profile)
+		print(profiler.summary())
+	for e in errors:
+		print("Error : "+e)
+	sys.exit(0 if len(errors) == 0 else 1)
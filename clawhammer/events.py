@@ -0,0 +1,138 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		events.py
+#		Purpose:	Timed event table for a compiled tune
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import bisect,array
+from .tune import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		One event, returned by queries.
+#
+# ***************************************************************************************************
+
+class TuneEvent(object):
+	__slots__ = ("time","string","sample","kind")
+	def __init__(self,time,string,sample,kind):
+		self.time = time 														# ms from start
+		self.string = string 													# 1-5, 0 for metronome
+		self.sample = sample 													# sample id, -1 for metronome
+		self.kind = kind
+	def toString(self):
+		return "{0:.3f},{1},{2},{3}".format(self.time,self.string,self.sample,self.kind)
+
+# ***************************************************************************************************
+#
+#		All the sounds the player makes, sorted by time, worked out as player.agc does. A bar
+#		is 'beats' beats long with 8 half notes (6 if 3 beats), a note plays sample tuning
+#		+ fret, the end of a hammer on, pull off or slide one half note later, and the
+#		metronome on every beat. The .plux only gives a slide's length, so the player always
+#		slides up, and so does the table.
+#
+# ***************************************************************************************************
+
+class EventTable(object):
+	def __init__(self):
+		self.times = array.array("d")
+		self.strings = array.array("b")
+		self.samples = array.array("h")
+		self.kinds = array.array("b")
+	#
+	#		Create from a compiled tune.
+	#
+	@staticmethod
+	def fromTune(tune):
+		notesInBar = EventTable.getNotesInBar(tune.keys)
+		notes = []
+		for b in range(0,len(tune.bars)):
+			for h,plucks in enumerate(tune.bars[b].plucks[:notesInBar]):
+				for p in [x for x in plucks if x is not None]:
+					notes.append((b,h,p.string,p.fret,EventTable.getEndFret(p) if p.isModified else None))
+		return EventTable.fromNotes(tune.keys,notes,len(tune.bars))
+	#
+	#		Create from keys and a list of (bar,half note,string,fret,end fret or None)
+	#
+	@staticmethod
+	def fromNotes(keys,notes,barCount):
+		notesInBar = EventTable.getNotesInBar(keys)
+		halfNote = ClawhammerTune.getNumber(keys,"beats") * 60000.0 / ClawhammerTune.getNumber(keys,"tempo") / notesInBar
+		tuning = EventTable.TUNINGS.get(keys["tuning"].lower(),EventTable.TUNINGS["gdgbd"])
+		events = []
+		for bar,h,string,fret,endFret in notes:
+			step = bar * notesInBar + h
+			events.append((step * halfNote,EventTable.PLUCK,string,tuning[string]+fret))
+			if endFret is not None:
+				events.append(((step+1) * halfNote,EventTable.MODIFIER,string,tuning[string]+endFret))
+		for step in range(0,barCount * notesInBar,2):
+			events.append((step * halfNote,EventTable.METRONOME,0,-1))
+		table = EventTable()
+		for time,kind,string,sample in sorted(events):
+			table.append(TuneEvent(time,string,sample,kind))
+		return table
+	#
+	@staticmethod
+	def getEndFret(pluck):
+		return pluck.fret + abs(pluck.endFret - pluck.fret) if pluck.isSlide else pluck.endFret
+	#
+	@staticmethod
+	def getNotesInBar(keys):
+		return 6 if ClawhammerTune.getNumber(keys,"beats") == 3 else 8
+	#
+	def append(self,event):
+		self.times.append(event.time)
+		self.strings.append(event.string)
+		self.samples.append(event.sample)
+		self.kinds.append(event.kind)
+	#
+	#		Access
+	#
+	def __len__(self):
+		return len(self.times)
+	def get(self,n):
+		return TuneEvent(self.times[n],self.strings[n],self.samples[n],self.kinds[n])
+	def getLength(self):
+		return self.times[-1] if len(self.times) != 0 else 0.0
+	#
+	#		Events with start <= time < end
+	#
+	def query(self,start,end):
+		return [self.get(n) for n in range(bisect.bisect_left(self.times,start),bisect.bisect_left(self.times,end))]
+	#
+	#		Read and write as text, one event per line.
+	#
+	def toText(self):
+		return "".join([self.get(n).toString()+"\n" for n in range(0,len(self))])
+	#
+	def write(self,fileName):
+		return ClawhammerTune.writeFile(fileName,self.toText())
+	#
+	@staticmethod
+	def read(fileName):
+		table = EventTable()
+		for line in open(fileName).readlines():
+			if line.strip() != "":
+				parts = line.strip().split(",")
+				table.append(TuneEvent(float(parts[0]),int(parts[1]),int(parts[2]),int(parts[3])))
+		return table
+
+EventTable.EXTENSION = ".events"
+EventTable.PLUCK = 0 															# event kinds
+EventTable.MODIFIER = 1 														# end of hammer on, pull off, slide
+EventTable.METRONOME = 2
+EventTable.TUNINGS = {  														# sample for open string 1-5
+	"gdgbd":	[ 0,15,12,8,3,20 ],
+	"gcgcd":	[ 0,15,13,8,1,20 ]
+}
+
+if __name__ == "__main__":
+	table = EventTable.fromTune(ClawhammerTune(getPath("clawhammer","cripple.claw")))
+	for e in table.query(0,4000):
+		print(e.toString())
@@ -0,0 +1,95 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		lexer.py
+#		Purpose:	Bar descriptor tokeniser
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import re
+from .musicex import *
+
+# ***************************************************************************************************
+#
+#		A single token. Offset is the position in the (preprocessed) descriptor. Value is the
+#		chord name (chord), the frets (notes) or the fret index (modify). String is the first
+#		string for notes.
+#
+# ***************************************************************************************************
+
+class BarToken(object):
+	__slots__ = ("kind","offset","text","value","string")
+	#
+	def __init__(self,kind,offset,text,value = None,string = None):
+		self.kind = kind
+		self.offset = offset
+		self.text = text
+		self.value = value
+		self.string = string
+	#
+	def isSlide(self):
+		return self.text[0] == "/"
+	#
+	def __repr__(self):
+		return "{0}@{1}:{2}".format(self.kind,self.offset,self.text)
+
+BarToken.REST = "rest"																# & 	rest
+BarToken.BACK = "back"																# - 	back half a beat
+BarToken.DRONE = "drone"															# . 	pluck 5th string
+BarToken.BRUSH = "brush"															# ! 	brush
+BarToken.CHORD = "chord"															# (c) 	chord
+BarToken.NOTES = "notes"															# xfff 	fretting
+BarToken.MODIFY = "modify"															# [hp/]f hammer/pull/slide
+
+# ***************************************************************************************************
+#
+#		Tokenises a descriptor left to right in one pass. Tokens are generated lazily so errors
+#		are raised in the same order as the bar uses the tokens.
+#
+# ***************************************************************************************************
+
+class BarLexer(object):
+	def __init__(self,definition):
+		self.definition = definition
+	#
+	#		Generate the tokens.
+	#
+	def tokens(self):
+		d = self.definition
+		pos = 0
+		while True:
+			c = d[pos] if pos < len(d) else ""
+			if c == "&" or c == "-" or c == "." or c == "!":						# single character
+				yield BarToken(BarLexer.SINGLES[c],pos,c)
+				pos += 1
+			else:
+				m = BarLexer.CHORD.match(d,pos)										# (chord)
+				if m is not None:
+					yield BarToken(BarToken.CHORD,pos,m.group(0),m.group(1))
+				else:
+					m = BarLexer.NOTES.match(d,pos)									# xxxfff fretting.
+					if m is not None:
+						yield BarToken(BarToken.NOTES,pos,m.group(0),m.group(2),1+len(m.group(1)))
+					else:
+						m = BarLexer.MODIFY.match(d,pos)							# [HP/][Fret]
+						if m is None:										# spaces left at the end by
+							rest = d[pos:] if pos == 0 else d[pos:].rstrip()	# @s only show in the first
+							raise MusicException("Do not understand '{0}'".format(rest))
+						yield BarToken(BarToken.MODIFY,pos,m.group(0),BarLexer.FRETTING.find(m.group(2)))
+				pos = m.end()
+			while pos < len(d) and d[pos].isspace():								# skip spaces
+				pos += 1
+			if pos == len(d):
+				return
+
+BarLexer.FRETTING = "0123456789nlwtufsv"											# Fret representations
+BarLexer.SINGLES = { "&":BarToken.REST,"-":BarToken.BACK,".":BarToken.DRONE,"!":BarToken.BRUSH }
+BarLexer.CHORD = re.compile("\\((.*?)\\)")
+BarLexer.NOTES = re.compile("(x*)(["+BarLexer.FRETTING+"]+)")
+BarLexer.MODIFY = re.compile("([hp\\/])(["+BarLexer.FRETTING+"])")
+
+if __name__ == "__main__":
+	print(list(BarLexer("5 & x2p0 xx3. (c)! x1/5 -").tokens()))
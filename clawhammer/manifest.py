@@ -0,0 +1,84 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		manifest.py
+#		Purpose:	Build manifest, records what was compiled from what.
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,json,hashlib
+
+# ***************************************************************************************************
+#
+#		The manifest maps each source (relative to the source tree) to the hash of its contents,
+#		the compiler version used and the output file it produced. Outputs are kept relative to
+#		the manifest's directory, so it doesn't matter where the build is run from.
+#
+# ***************************************************************************************************
+
+class BuildManifest(object):
+	def __init__(self,fileName):
+		self.fileName = fileName
+		self.directory = os.path.dirname(fileName) or "."
+		self.entries = {}
+		if os.path.exists(fileName):
+			try:
+				self.entries = json.load(open(fileName))
+			except ValueError:											# corrupt manifest, rebuild all.
+				self.entries = {}
+		self.changed = False
+	#
+	#		Check if a source is up to date.
+	#
+	def isCurrent(self,source,hash,version):
+		entry = self.entries.get(source)
+		if entry is None or entry["hash"] != hash or entry["version"] != version:
+			return False
+		return os.path.exists(self.getOutput(source))
+	#
+	#		Record a successful compile
+	#
+	def update(self,source,hash,version,output):
+		entry = { "hash":hash,"version":version,"output":os.path.relpath(output,self.directory).replace(os.sep,"/") }
+		if self.entries.get(source) != entry:
+			self.entries[source] = entry
+			self.changed = True
+	#
+	#		Remove a source, returns its output file.
+	#
+	def remove(self,source):
+		output = self.getOutput(source)
+		self.changed = True
+		self.entries.pop(source)
+		return output
+	#
+	#		Access
+	#
+	def getSources(self):
+		return list(self.entries.keys())
+	def getOutput(self,source):
+		if source not in self.entries:
+			return None
+		return os.path.join(self.directory,*self.entries[source]["output"].split("/"))
+	#
+	#		Write out if anything has changed.
+	#
+	def save(self):
+		if self.changed:
+			h = open(self.fileName,"w")
+			json.dump(self.entries,h,indent=1,sort_keys=True)
+			h.close()
+			self.changed = False
+	#
+	#		Hash a file's contents.
+	#
+	@staticmethod
+	def hashFile(fileName):
+		return hashlib.sha1(open(fileName,"rb").read()).hexdigest()
+
+if __name__ == "__main__":
+	m = BuildManifest("__manifest.json")
+	print(m.getSources())
@@ -17,14 +17,30 @@
 
 class MusicException(Exception):
 	#
-	def __init__(self,msg):
+	def __init__(self,msg,index = None):
 		self.errorMessage = msg
-		self.index = MusicException.Number
+		self.index = index 													# bar number, set by the bar.
+		self.fileName = None 												# source file, set by the tune.
 	#
 	def getMessage(self):
-		return "{0} ({1})".format(self.errorMessage,self.index)
+		msg = self.errorMessage if self.index is None else "{0} ({1})".format(self.errorMessage,self.index)
+		return msg if self.fileName is None else "{0} : {1}".format(self.fileName,msg)
+
+# ***************************************************************************************************
+#
+#							Several errors collected from one tune
+#
+# ***************************************************************************************************
+
+class MusicExceptionList(MusicException):
+	#
+	def __init__(self,errors):
+		MusicException.__init__(self,errors[0].errorMessage,errors[0].index)
+		self.errors = errors
+	#
+	def getMessage(self):
+		return "\n".join([x.getMessage() for x in self.errors])
 
 
 if __name__ == "__main__":
-	MusicException.Number = 42
-	print(MusicException("Test Error").getMessage())
\ No newline at end of file
+	print(MusicException("Test Error",42).getMessage())
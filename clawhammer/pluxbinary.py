@@ -0,0 +1,192 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		pluxbinary.py
+#		Purpose:	Binary .plux format writer, reader and verifier
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import sys,struct,argparse
+from .tune import *
+
+# ***************************************************************************************************
+#
+#		Format (little endian)
+#
+#			"PLXB" u16 version
+#			u16 key count, then key and value for each (u16 length + utf-8 text)
+#			u16 chord count, then chord names (u16 length + utf-8 text)
+#			u32 bar count
+#			for each bar : u8 half notes, then a record for each half note of 5 x (u8 fret,u8 mod)
+#			for strings 1-5 and u8 chord index. fret is 0xFF if not played, mod is kind << 5 | end
+#			fret where kind is 0 (none) 1 (hammer on/pull off) 2 (slide). No chord is 0xFF.
+#
+# ***************************************************************************************************
+
+class PluxBinary(object):
+	pass
+
+PluxBinary.EXTENSION = ".pluxb"
+PluxBinary.MAGIC = b"PLXB"
+PluxBinary.VERSION = 1
+PluxBinary.NONE = 0xFF
+PluxBinary.RECORD = 11															# bytes in half note record
+
+# ***************************************************************************************************
+#										Binary writer
+# ***************************************************************************************************
+
+class PluxBinaryWriter(PluxBinary):
+	#
+	#		Convert a compiled tune to bytes
+	#
+	def convert(self,tune):
+		chords = []
+		for bar in tune.bars:													# collect chord names
+			for c in bar.chords:
+				if c is not None and c not in chords:
+					chords.append(c)
+		data = [ PluxBinary.MAGIC,struct.pack("<HH",PluxBinary.VERSION,len(tune.keys)) ]
+		for k in tune.keys.keys():
+			data += [ self.text(k),self.text(tune.keys[k]) ]
+		data.append(struct.pack("<H",len(chords)))
+		data += [ self.text(c) for c in chords ]
+		data.append(struct.pack("<I",len(tune.bars)))
+		for bar in tune.bars:
+			data.append(self.convertBar(bar,chords))
+		return b"".join(data)
+	#
+	def convertBar(self,bar,chords):
+		halfNotes = bar.notes * 2
+		record = bytearray(1+halfNotes*PluxBinary.RECORD)
+		record[0] = halfNotes
+		for p in range(0,halfNotes):
+			base = 1+p*PluxBinary.RECORD
+			for s in range(0,5):
+				cell = p*5+s
+				record[base+s*2] = bar.frets[cell]
+				if bar.frets[cell] != Pluck.EMPTY:
+					record[base+s*2+1] = (bar.modifiers[cell] << 5) | bar.endFrets[cell]
+			record[base+10] = PluxBinary.NONE if bar.chords[p] is None else chords.index(bar.chords[p])
+		return bytes(record)
+	#
+	def text(self,s):
+		s = s.encode()
+		return struct.pack("<H",len(s))+s
+	#
+	#		Write a tune, only if changed. Returns True if written.
+	#
+	def write(self,tune,fileName):
+		return ClawhammerTune.writeFile(fileName,self.convert(tune))
+
+# ***************************************************************************************************
+#
+#		Binary reader. The file is read in one go, and bars are located by offset ; nothing is
+#		parsed until it is asked for.
+#
+# ***************************************************************************************************
+
+class PluxBinaryReader(PluxBinary):
+	def __init__(self,source):
+		self.data = source if isinstance(source,bytes) else open(source,"rb").read()
+		if self.data[:4] != PluxBinary.MAGIC:
+			raise MusicException("Not a binary plux file")
+		version,keyCount = struct.unpack_from("<HH",self.data,4)
+		if version != PluxBinary.VERSION:
+			raise MusicException("Unsupported binary plux version {0}".format(version))
+		self.offset = 8
+		self.keys = {}
+		for i in range(0,keyCount):
+			key = self.readText()
+			self.keys[key] = self.readText()
+		self.chordNames = [ self.readText() for i in range(0,self.readInt("<H")) ]
+		self.barOffsets = []													# offset of each bar
+		for i in range(0,self.readInt("<I")):
+			self.barOffsets.append(self.offset)
+			self.offset += 1+self.data[self.offset]*PluxBinary.RECORD
+		if self.offset != len(self.data):
+			raise MusicException("Binary plux file is the wrong size")
+	#
+	def readInt(self,format):
+		n = struct.unpack_from(format,self.data,self.offset)[0]
+		self.offset += struct.calcsize(format)
+		return n
+	#
+	def readText(self):
+		n = self.readInt("<H")
+		self.offset += n
+		return self.data[self.offset-n:self.offset].decode()
+	#
+	#		Access
+	#
+	def getBarCount(self):
+		return len(self.barOffsets)
+	def getHalfNotes(self,bar):
+		return self.data[self.barOffsets[bar]]
+	#
+	#		Get (fret,kind,end fret) for string 1-5 at half note, None if not played.
+	#
+	def getCell(self,bar,halfNote,string):
+		p = self.barOffsets[bar]+1+halfNote*PluxBinary.RECORD+(string-1)*2
+		if self.data[p] == PluxBinary.NONE:
+			return None
+		return (self.data[p],self.data[p+1] >> 5,self.data[p+1] & 0x1F)
+	#
+	def getChord(self,bar,halfNote):
+		c = self.data[self.barOffsets[bar]+1+halfNote*PluxBinary.RECORD+10]
+		return None if c == PluxBinary.NONE else self.chordNames[c]
+	#
+	#		Recreate the text .plux
+	#
+	def toText(self):
+		keys = "".join(".{0}:={1}\n".format(k,self.keys[k]) for k in self.keys.keys())
+		return keys + "".join(["|{0}\n".format(self.renderBar(b)) for b in range(0,self.getBarCount())])
+	#
+	def renderBar(self,bar):
+		return ".".join([self.renderHalfNote(bar,p) for p in range(0,self.getHalfNotes(bar))])
+	#
+	def renderHalfNote(self,bar,p):
+		s = ""
+		for string in range(1,6):
+			cell = self.getCell(bar,p,string)
+			if cell is not None:
+				s = s + Pluck.encode(string,cell[0],cell[1],cell[2])
+		return s
+
+# ***************************************************************************************************
+#
+#		Check a binary file is equivalent to a text file, byte for byte. Returns a list of
+#		differences, empty if they match.
+#
+# ***************************************************************************************************
+
+class PluxBinaryVerifier(object):
+	def verify(self,binaryFile,textFile):
+		try:
+			text = PluxBinaryReader(binaryFile).toText().split("\n")
+		except MusicException as e:
+			return [ e.getMessage() ]
+		original = open(textFile,"rb").read().decode().replace("\r\n","\n").split("\n")
+		errors = []
+		for i in range(0,max(len(text),len(original))):
+			a = text[i] if i < len(text) else "<missing>"
+			b = original[i] if i < len(original) else "<missing>"
+			if a != b:
+				errors.append("Line {0} : binary '{1}' text '{2}'".format(i+1,a,b))
+		return errors
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Verify .pluxb files against their .plux files")
+	parser.add_argument("files",nargs = "+",help = ".plux files to check")
+	args = parser.parse_args()
+	failed = 0
+	for f in args.files:
+		errors = PluxBinaryVerifier().verify(f[:-5]+PluxBinary.EXTENSION,f)
+		print("{0} {1}".format("Failed" if len(errors) != 0 else "Ok",f))
+		for e in errors[:10]:
+			print("\t"+e)
+		failed += 1 if len(errors) != 0 else 0
+	sys.exit(0 if failed == 0 else 1)
@@ -0,0 +1,148 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		profiler.py
+#		Purpose:	Optional per phase timing of the compiler
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import time,json
+
+# ***************************************************************************************************
+#
+#		Records time, calls and bytes for each phase, per file, and the time for each bar. The
+#		compiler wraps its phases in "with CompileProfiler.phase(name):" ; when no profiler is
+#		active this returns a shared object that does nothing.
+#
+# ***************************************************************************************************
+
+class CompileProfiler(object):
+	def __init__(self):
+		self.files = {}
+		self.currentFile = "<tree>"										# phases outside any file.
+	#
+	#		Start and stop profiling.
+	#
+	def start(self):
+		CompileProfiler.active = self
+		return self
+	def stop(self):
+		CompileProfiler.active = None
+	#
+	#		Timers for the compiler to use.
+	#
+	@staticmethod
+	def phase(name,size = 0):
+		profiler = CompileProfiler.active
+		return CompileProfiler.NULLTIMER if profiler is None else PhaseTimer(profiler,name,size)
+	@staticmethod
+	def file(fileName,name = "tune"):
+		profiler = CompileProfiler.active
+		return CompileProfiler.NULLTIMER if profiler is None else FileTimer(profiler,fileName,name)
+	@staticmethod
+	def bar(barNumber,descriptor):
+		profiler = CompileProfiler.active
+		return CompileProfiler.NULLTIMER if profiler is None else BarTimer(profiler,barNumber,descriptor)
+	#
+	#		Record results
+	#
+	def getFile(self,fileName):
+		if fileName not in self.files:
+			self.files[fileName] = { "phases":{},"bars":[] }
+		return self.files[fileName]
+	#
+	def record(self,name,elapsed,size):
+		phases = self.getFile(self.currentFile)["phases"]
+		if name not in phases:
+			phases[name] = { "seconds":0.0,"calls":0,"bytes":0 }
+		phases[name]["seconds"] += elapsed
+		phases[name]["calls"] += 1
+		phases[name]["bytes"] += size
+	#
+	def recordBar(self,barNumber,descriptor,elapsed):
+		self.getFile(self.currentFile)["bars"].append([barNumber,descriptor,elapsed])
+		self.record("bar",elapsed,0)
+	#
+	#		Create the report. Phase times include any phases inside them, so "tune" includes
+	#		"bar" which includes "endfretting".
+	#
+	def report(self):
+		totals = {}
+		for f in self.files.values():
+			for name,phase in f["phases"].items():
+				if name not in totals:
+					totals[name] = { "seconds":0.0,"calls":0,"bytes":0 }
+				for k in phase.keys():
+					totals[name][k] += phase[k]
+		return { "totals":totals,"files":self.files }
+	#
+	def save(self,fileName):
+		json.dump(self.report(),open(fileName,"w"),indent = 1,sort_keys = True)
+	#
+	#		Text summary of the slowest tunes and bars.
+	#
+	def summary(self,count = 10):
+		report = self.report()
+		lines = [ "Phase totals :" ]
+		for name,phase in sorted(report["totals"].items(),key = lambda x:-x[1]["seconds"]):
+			lines.append("  {0:<16} {1:>10.4f}s {2:>8} calls {3:>10} bytes".format(name,phase["seconds"],phase["calls"],phase["bytes"]))
+		tunes = [(f,self.files[f]["phases"]["tune"]["seconds"]) for f in self.files.keys() if "tune" in self.files[f]["phases"]]
+		lines.append("Slowest tunes :")
+		for f,t in sorted(tunes,key = lambda x:-x[1])[:count]:
+			lines.append("  {0:>10.4f}s {1}".format(t,f))
+		bars = [(f,b) for f in self.files.keys() for b in self.files[f]["bars"]]
+		lines.append("Slowest bars :")
+		for f,b in sorted(bars,key = lambda x:-x[1][2])[:count]:
+			lines.append("  {0:>10.4f}s {1} bar {2} '{3}'".format(b[2],f,b[0],b[1]))
+		return "\n".join(lines)
+
+CompileProfiler.active = None
+
+# ***************************************************************************************************
+#											Timers
+# ***************************************************************************************************
+
+class NullTimer(object):
+	def __enter__(self):
+		return self
+	def __exit__(self,*args):
+		return False
+
+class PhaseTimer(object):
+	def __init__(self,profiler,name,size):
+		self.profiler = profiler
+		self.name = name
+		self.size = size
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+	def __exit__(self,*args):
+		self.profiler.record(self.name,time.perf_counter()-self.start,self.size)
+		return False
+
+class FileTimer(PhaseTimer):
+	def __init__(self,profiler,fileName,name):
+		PhaseTimer.__init__(self,profiler,name,0)
+		self.fileName = fileName
+	def __enter__(self):
+		self.previousFile = self.profiler.currentFile
+		self.profiler.currentFile = self.fileName
+		return PhaseTimer.__enter__(self)
+	def __exit__(self,*args):
+		PhaseTimer.__exit__(self,*args)
+		self.profiler.currentFile = self.previousFile
+		return False
+
+class BarTimer(PhaseTimer):
+	def __init__(self,profiler,barNumber,descriptor):
+		PhaseTimer.__init__(self,profiler,"bar",0)
+		self.barNumber = barNumber
+		self.descriptor = descriptor
+	def __exit__(self,*args):
+		self.profiler.recordBar(self.barNumber,self.descriptor,time.perf_counter()-self.start)
+		return False
+
+CompileProfiler.NULLTIMER = NullTimer()
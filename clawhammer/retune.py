@@ -0,0 +1,253 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		retune.py
+#		Purpose:	Re-fret compiled tunes for another tuning or transposition.
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,time,itertools,argparse
+import numpy
+from .tune import *
+from .events import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		The plucks of a set of compiled tunes are held as arrays of (bar,half note,string), the
+#		frets, modifiers and end frets straight from each Bar's storage. Every note is first
+#		moved to the same string with the fret changed by the difference in tuning and the
+#		transposition, all at once. Half notes where some notes would then be off the fretboard
+#		are fretted again, trying every way of putting their notes on the strings.
+#
+# ***************************************************************************************************
+
+class RetuneEngine(object):
+	def __init__(self):
+		self.tunes = []
+		self.errors = []
+	#
+	#		Add compiled tunes.
+	#
+	def load(self,tunes):
+		self.tunes += tunes
+	#
+	def getArrays(self,tune):
+		shape = (len(tune.bars),tune.bars[0].notes * 2 if len(tune.bars) != 0 else 8,5)
+		arrays = []
+		for name in ["frets","modifiers","endFrets"]:
+			data = b"".join([bytes(getattr(bar,name)) for bar in tune.bars])
+			arrays.append(numpy.frombuffer(data,dtype = numpy.uint8).reshape(shape).astype(numpy.int16))
+		return arrays
+	#
+	#		Re-fret all the tunes loaded, returns a RetunedTune for each one that could be done,
+	#		errors are in self.errors
+	#
+	def retune(self,tuning = None,transpose = 0):
+		results = []
+		self.errors = []
+		for tune in self.tunes:
+			target = tuning if tuning is not None else tune.keys["tuning"]
+			try:
+				results.append(self.retuneOne(tune,target,transpose))
+			except MusicException as e:
+				e.fileName = tune.tuneName
+				self.errors.append(e)
+		return results
+	#
+	def retuneOne(self,tune,tuning,transpose):
+		source = RetuneEngine.getOpenStrings(tune.keys["tuning"])
+		target = RetuneEngine.getOpenStrings(tuning)
+		frets,modifiers,endFrets = self.getArrays(tune)
+		delta = source - target + transpose 										# fret change for each string
+		played = frets != Pluck.EMPTY
+		modified = played & (modifiers != Pluck.NONE)
+		newFrets = numpy.where(played,frets + delta,Pluck.EMPTY)
+		newEnds = numpy.where(modified,endFrets + delta,0)
+		fits = (newFrets >= 0) & (newFrets <= RetuneEngine.MAXFRET)
+		fits &= ~modified | ((newEnds >= 0) & (newEnds <= RetuneEngine.MAXFRET))
+		newModifiers = numpy.where(played,modifiers,0)
+		for bar,halfNote in sorted(set([(x[0],x[1]) for x in numpy.argwhere(played & ~fits).tolist()])):
+			self.reassign(bar,halfNote,target,newFrets,newModifiers,newEnds,frets,modified)
+		keys = dict(tune.keys)
+		keys["tuning"] = tuning
+		for k in [x for x in keys.keys() if x.startswith("chord_")]:				# re-fret the chords
+			chord = tune.chordTable.get(k[6:])
+			if chord is not None:
+				chord = [ f + delta[s] for s,f in enumerate(chord[:4]) ]
+				if min(chord) >= 0 and max(chord) <= RetuneEngine.MAXFRET:
+					keys[k] = "".join([Bar.FRETTING[f] for f in chord])
+				else:
+					self.checkChordUnused(tune,k[6:])
+					del keys[k]												# not used, so dropped
+		return RetunedTune(tune.tuneName,keys,newFrets,newModifiers,newEnds,[bar.chords for bar in tune.bars])
+	#
+	#		A chord which doesn't fit the new tuning is an error where it is played.
+	#
+	def checkChordUnused(self,tune,chord):
+		for bar in tune.bars:
+			if chord in bar.chords:
+				raise MusicException("Chord {0} doesn't fit at half note {1}".format(chord,bar.chords.index(chord)+1),bar.barNumber)
+	#
+	#		Some notes in this half note don't fit, so find the strings for all the notes in it
+	#		that fit, changing as few strings as possible, then using the lowest frets.
+	#
+	def reassign(self,bar,halfNote,target,newFrets,newModifiers,newEnds,frets,modified):
+		notes = [ s for s in range(0,5) if frets[bar,halfNote,s] != Pluck.EMPTY ]
+		pitches = [ newFrets[bar,halfNote,s] + target[s] for s in notes ]		# pitch in target tuning
+		endPitches = [ newEnds[bar,halfNote,s] + target[s] for s in notes ]
+		best = None
+		for strings in itertools.permutations(range(0,5),len(notes)):
+			newF = [ pitches[i] - target[strings[i]] for i in range(0,len(notes)) ]
+			newE = [ endPitches[i] - target[strings[i]] for i in range(0,len(notes)) ]
+			if all([0 <= newF[i] <= RetuneEngine.MAXFRET and (not modified[bar,halfNote,notes[i]] or 0 <= newE[i] <= RetuneEngine.MAXFRET) for i in range(0,len(notes))]):
+				score = (len([i for i in range(0,len(notes)) if strings[i] != notes[i]]),sum(newF))
+				if best is None or score < best[0]:
+					best = (score,strings,newF,newE)
+		if best is None:
+			raise MusicException("No strings for half note {0}".format(halfNote+1),bar+1)
+		kinds = [ newModifiers[bar,halfNote,s] for s in notes ]
+		newFrets[bar,halfNote,:] = Pluck.EMPTY
+		newModifiers[bar,halfNote,:] = Pluck.NONE
+		newEnds[bar,halfNote,:] = 0
+		for i in range(0,len(notes)):
+			s = best[1][i]
+			newFrets[bar,halfNote,s] = best[2][i]
+			newModifiers[bar,halfNote,s] = kinds[i]
+			newEnds[bar,halfNote,s] = best[3][i] if kinds[i] != Pluck.NONE else 0
+	#
+	@staticmethod
+	def getOpenStrings(tuning):
+		if tuning not in EventTable.TUNINGS:
+			raise MusicException("Unknown tuning "+tuning)
+		return numpy.array(EventTable.TUNINGS[tuning][1:],dtype = numpy.int16)		# open strings 1-5
+
+RetuneEngine.MAXFRET = len(Bar.FRETTING) - 1
+
+# ***************************************************************************************************
+#
+#		A re-fretted tune, which can be written as .plux or as .claw source. The source has
+#		every pluck written out, so brushes and drones become notes, and only the tempo, beats,
+#		tuning and chord keys.
+#
+# ***************************************************************************************************
+
+class RetunedTune(object):
+	def __init__(self,tuneName,keys,frets,modifiers,endFrets,chords):
+		self.tuneName = tuneName
+		self.keys = keys
+		self.frets = frets 															# bar,half note,string
+		self.modifiers = modifiers
+		self.endFrets = endFrets
+		self.chords = chords 														# bar,half note
+	#
+	#		.plux text
+	#
+	def renderPlux(self):
+		keys = "".join(".{0}:={1}\n".format(k,self.keys[k]) for k in self.keys.keys())
+		return keys + "".join(["|{0}\n".format(self.renderBar(b)) for b in range(0,len(self.frets))])
+	#
+	def renderBar(self,bar):
+		notes = []
+		for h in range(0,self.frets.shape[1]):
+			s = ""
+			for string in range(0,5):
+				fret = int(self.frets[bar,h,string])
+				if fret != Pluck.EMPTY:
+					s = s + Pluck.encode(string+1,fret,self.modifiers[bar,h,string],int(self.endFrets[bar,h,string]))
+			notes.append(s)
+		return ".".join(notes)
+	#
+	#		.claw source
+	#
+	def renderClaw(self):
+		keys = [ k for k in self.keys.keys() if k in ClawhammerTune.DEFAULTS or k.startswith("chord_") ]
+		lines = [ "// "+self.tuneName+" (re-fretted)" ] + [ "{0} := {1}".format(k,self.keys[k]) for k in keys ] + [ "" ]
+		bars = [ self.renderClawBar(b) for b in range(0,len(self.frets)) ]
+		for i in range(0,len(bars),4):
+			lines.append(" | ".join(bars[i:i+4]))
+		return "\n".join(lines)+"\n"
+	#
+	#		Write a bar using rests (&) and steps back (-) to get to each half note.
+	#
+	def renderClawBar(self,bar):
+		tokens = []
+		pos = 0
+		for h in range(0,self.frets.shape[1]):
+			runs = self.getRuns(bar,h)
+			if len(runs) == 0 and self.chords[bar][h] is None:
+				continue
+			while pos < h:															# move to the half note
+				tokens += [ "&" ] if pos + 2 <= h else [ "&","-" ]
+				pos = min(pos + 2,h)
+			while pos > h:
+				tokens.append("-")
+				pos -= 1
+			if self.chords[bar][h] is not None:
+				tokens.append("("+self.chords[bar][h]+")")
+			for n in range(0,len(runs)):
+				if n != 0:															# back to the same half note
+					tokens += [ "-","-" ]
+				string,frets = runs[n]
+				token = "x" * string + "".join([Bar.FRETTING[f] for f in frets])
+				if self.modifiers[bar,h,string] != Pluck.NONE:
+					endFret = int(self.endFrets[bar,h,string])
+					c = "/" if self.modifiers[bar,h,string] == Pluck.SLIDE else ("h" if endFret > frets[0] else "p")
+					token = token + c + Bar.FRETTING[endFret]
+				tokens.append(token)
+				pos = h + 2
+		return " ".join(tokens) if len(tokens) != 0 else "&"
+	#
+	#		Runs of plucks on adjacent strings, as (first string 0-4,[frets]). A modified pluck
+	#		is a run of its own and comes first, as a modifier needs one pluck in the half note.
+	#
+	def getRuns(self,bar,h):
+		modified = []
+		runs = []
+		for string in range(0,5):
+			fret = int(self.frets[bar,h,string])
+			if fret != Pluck.EMPTY and self.modifiers[bar,h,string] != Pluck.NONE:
+				modified.append((string,[fret]))
+			elif fret != Pluck.EMPTY:
+				if len(runs) != 0 and runs[-1][0] + len(runs[-1][1]) == string:
+					runs[-1][1].append(fret)
+				else:
+					runs.append((string,[fret]))
+		return modified + runs
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Re-fret tunes for another tuning or transposition")
+	parser.add_argument("files",nargs = "*",help = ".claw files, default the whole music tree")
+	parser.add_argument("-u","--tuning",help = "target tuning (gdgbd or gcgcd)")
+	parser.add_argument("-t","--transpose",type = int,default = 0,help = "semitones to transpose by")
+	parser.add_argument("-o","--output",default = "retuned",help = "target directory")
+	parser.add_argument("-c","--claw",action = "store_true",help = "also write .claw source")
+	args = parser.parse_args()
+	files = args.files
+	if len(files) == 0:
+		for root,dirs,names in os.walk(getPath("music")):
+			files += [ root+os.sep+f for f in sorted(names) if f.endswith(".claw") ]
+	start = time.perf_counter()
+	engine = RetuneEngine()
+	errors = []
+	for f in files:
+		try:
+			engine.load([ ClawhammerTune(f) ])
+		except MusicException as e:
+			errors.append(e)
+	loaded = time.perf_counter()
+	results = engine.retune(args.tuning,args.transpose)
+	if not os.path.exists(args.output):
+		os.makedirs(args.output)
+	for tune in results:
+		ClawhammerTune.writeFile(args.output+os.sep+tune.tuneName+".plux",tune.renderPlux())
+		if args.claw:
+			ClawhammerTune.writeFile(args.output+os.sep+tune.tuneName+".claw",tune.renderClaw())
+	for e in errors + engine.errors:
+		print("Error : "+e.getMessage())
+	print("Re-fretted {0} of {1} tunes, compiled in {2:.2f}s, re-fretted and written in {3:.2f}s".format(
+												len(results),len(files),loaded-start,time.perf_counter()-loaded))
+	sys.exit(0 if len(errors + engine.errors) == 0 else 1)
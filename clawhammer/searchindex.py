@@ -0,0 +1,175 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		searchindex.py
+#		Purpose:	Inverted index of the compiled library, and queries on it.
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,json,time,argparse
+from .tune import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		Each tune is described by a set of terms and some values. Terms are
+#
+#			tuning:gdgbd beats:4 tempo:60 chord:c brush string:1 fret:5 note:s1f5
+#			slide slide:s1 slide:f5 slide:s1f5 (also hammer and pull)
+#
+#		where a technique's fret is the one it ends on. Values are tempo, beats, bars and the
+#		lowest and highest frets used. The index keeps the document for each tune (by source)
+#		so it can be updated as tunes are compiled, and the postings, term to tunes.
+#
+# ***************************************************************************************************
+
+class SearchIndex(object):
+	def __init__(self,fileName):
+		self.fileName = fileName
+		self.documents = {} 														# source => document
+		self.postings = None 														# term => sources, built when needed
+		if os.path.exists(fileName):
+			try:
+				data = json.load(open(fileName))
+				if data.get("version") == SearchIndex.VERSION:
+					self.documents = data["documents"]
+					self.postings = { t:set(x) for t,x in data["postings"].items() }
+			except ValueError:														# corrupt, rebuild all.
+				self.documents = {}
+				self.postings = None
+		self.changed = False
+	#
+	#		Create the document for a compiled tune, path is the .plux file in the library.
+	#
+	@staticmethod
+	def createDocument(tune,path = None):
+		terms = set([ "tuning:"+tune.keys["tuning"],"beats:"+tune.keys["beats"],"tempo:"+tune.keys["tempo"] ])
+		frets = set()
+		for bar in tune.bars:
+			terms.update(["chord:"+c for c in bar.chords if c is not None])
+			if any(bar.brushes):
+				terms.add("brush")
+			for plucks in bar.plucks:
+				for p in [x for x in plucks if x is not None]:
+					SearchIndex.addNote(terms,"note",p.string,p.fret)
+					frets.add(p.fret)
+					if p.isModified:
+						kind = "slide" if p.isSlide else ("hammer" if p.endFret > p.fret else "pull")
+						SearchIndex.addNote(terms,kind,p.string,p.endFret)
+						SearchIndex.addNote(terms,"note",p.string,p.endFret)
+						frets.add(p.endFret)
+		values = { "tempo":float(ClawhammerTune.getNumber(tune.keys,"tempo")),"beats":ClawhammerTune.getNumber(tune.keys,"beats"),"bars":len(tune.bars),
+					"minFret":min(frets) if len(frets) != 0 else 0,"maxFret":max(frets) if len(frets) != 0 else 0 }
+		return { "path":path,"name":tune.tuneName,"terms":sorted(terms),"values":values }
+	#
+	@staticmethod
+	def addNote(terms,kind,string,fret):
+		terms.update([ kind,"{0}:s{1}".format(kind,string),"{0}:f{1}".format(kind,fret),"{0}:s{1}f{2}".format(kind,string,fret) ])
+		if kind == "note":
+			terms.update([ "string:{0}".format(string),"fret:{0}".format(fret) ])
+	#
+	#		Update and save.
+	#
+	def update(self,source,document):
+		if self.documents.get(source) != document:
+			self.documents[source] = document
+			self.postings = None
+			self.changed = True
+
+	def remove(self,source):
+		if source in self.documents:
+			del self.documents[source]
+			self.postings = None
+			self.changed = True
+
+	def has(self,source):
+		return source in self.documents
+
+	def save(self):
+		if self.changed:
+			postings = { t:sorted(s) for t,s in self.getPostings().items() }
+			h = open(self.fileName,"w")
+			json.dump({ "version":SearchIndex.VERSION,"documents":self.documents,"postings":postings },h,sort_keys = True)
+			h.close()
+			self.changed = False
+	#
+	#		Term => set of sources
+	#
+	def getPostings(self):
+		if self.postings is None:
+			self.postings = {}
+			for source,document in self.documents.items():
+				for t in document["terms"]:
+					if t not in self.postings:
+						self.postings[t] = set()
+					self.postings[t].add(source)
+		return self.postings
+	#
+	#		Sources with all the terms.
+	#
+	def findTerms(self,terms):
+		postings = self.getPostings()
+		result = None
+		for t in sorted(terms,key = lambda t: len(postings.get(t,()))):				# rarest first
+			result = set(postings.get(t,())) if result is None else result & postings.get(t,set())
+			if len(result) == 0:
+				break
+		return result if result is not None else set(self.documents.keys())
+	#
+	#		Structured query, returns matching documents sorted by path. fret may be a number
+	#		or a (low,high) range, tempo a (low,high) range, technique is slide, hammer or pull.
+	#		Technique, string and fret together mean that technique ending at that fret on that
+	#		string, without technique any note.
+	#
+	def query(self,tuning = None,chord = None,technique = None,string = None,fret = None,brush = False,
+																		beats = None,tempo = None,maxFret = None):
+		terms = []
+		terms += [ "tuning:"+tuning ] if tuning is not None else []
+		terms += [ "chord:"+chord ] if chord is not None else []
+		terms += [ "beats:{0}".format(beats) ] if beats is not None else []
+		terms += [ "brush" ] if brush else []
+		kind = technique if technique is not None else "note"
+		frets = fret if isinstance(fret,(tuple,list)) else ([ fret,fret ] if fret is not None else None)
+		if frets is None:
+			terms.append(kind if string is None else "{0}:s{1}".format(kind,string))
+			result = self.findTerms(terms)
+		else:																		# any fret in the range
+			result = set()
+			base = self.findTerms(terms)
+			for f in range(frets[0],frets[1]+1):
+				t = "{0}:f{1}".format(kind,f) if string is None else "{0}:s{1}f{2}".format(kind,string,f)
+				result |= base & self.getPostings().get(t,set())
+		documents = [self.documents[x] for x in result]
+		if tempo is not None:
+			documents = [x for x in documents if tempo[0] <= x["values"]["tempo"] <= tempo[1]]
+		if maxFret is not None:
+			documents = [x for x in documents if x["values"]["maxFret"] <= maxFret]
+		return sorted(documents,key = lambda x: x["path"])
+
+SearchIndex.VERSION = 1
+SearchIndex.FILENAME = "__search.json"
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Search the compiled music library")
+	parser.add_argument("-u","--tuning",help = "tuning, e.g. gdgbd")
+	parser.add_argument("-c","--chord",help = "uses this chord")
+	parser.add_argument("-t","--technique",choices = ["slide","hammer","pull"],help = "uses this technique")
+	parser.add_argument("-s","--string",type = int,help = "on this string")
+	parser.add_argument("-f","--fret",type = int,nargs = "+",help = "at this fret, or any in a range low high")
+	parser.add_argument("-b","--brush",action = "store_true",help = "has brushes")
+	parser.add_argument("--beats",type = int,help = "beats in a bar")
+	parser.add_argument("--tempo",type = float,nargs = 2,help = "tempo range low high")
+	parser.add_argument("--max-fret",type = int,help = "highest fret used")
+	parser.add_argument("-i","--index",default = getPath("agkbanjo","media","music",SearchIndex.FILENAME),help = "index file")
+	args = parser.parse_args()
+	start = time.perf_counter()
+	index = SearchIndex(args.index)
+	loaded = time.perf_counter()
+	fret = None if args.fret is None else (args.fret[0] if len(args.fret) == 1 else args.fret[:2])
+	result = index.query(args.tuning,args.chord,args.technique,args.string,fret,args.brush,args.beats,args.tempo,args.max_fret)
+	for d in result:
+		print(d["path"])
+	print("{0} tunes, loaded in {1:.1f}ms, query {2:.2f}ms".format(len(result),(loaded-start)*1000,(time.perf_counter()-loaded)*1000))
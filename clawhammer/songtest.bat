@@ -1,4 +1,6 @@
-python tune.py
+pushd ..
+python -m clawhammer test -t clawhammer\cripple.claw
+popd
 echo 0 >..\agkbanjo\media\showmenu.txt
 ..\agkbanjo\agkbanjo
 echo 1 >..\agkbanjo\media\showmenu.txt
@@ -0,0 +1,102 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		streamtune.py
+#		Purpose:	Streaming compiler, .claw lines in, .plux records out.
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import sys,argparse
+from .tune import *
+
+# ***************************************************************************************************
+#
+#		Compiles a tune a line at a time. Unlike ClawhammerTune, keys, macros and chords must be
+#		defined before they are used. Key records are written when they are assigned and any
+#		defaults not assigned are written before the first bar, so the player sees the same
+#		values. Nothing is kept apart from the keys and a limited cache of compiled bars, so
+#		there are no bars to render or show; the two share TuneCompiler, not the tune methods.
+#
+# ***************************************************************************************************
+
+class StreamingTune(TuneCompiler):
+	def __init__(self,tuneName = "<stdin>",cacheSize = 1024,rng = None):
+		TuneCompiler.__init__(self,tuneName,rng)
+		self.cacheSize = cacheSize 										# most bars to cache.
+	#
+	#		Generate the .plux records from an iterable of source lines.
+	#
+	def compile(self,lines):
+		try:
+			for record in self.generate(lines):
+				yield record
+		except MusicException as e:										# tag errors with the source.
+			for err in e.errors if isinstance(e,MusicExceptionList) else [e]:
+				err.fileName = self.tuneName
+			raise
+	#
+	def generate(self,lines):
+		self.keys = dict(ClawhammerTune.DEFAULTS)
+		self.chordTable = {}
+		self.macros = {}
+		self.barCache = {}
+		pending = list(ClawhammerTune.DEFAULTS.keys())					# defaults not written yet.
+		barNumber = 0
+		errors = []
+		for s in lines:
+			s = ClawhammerTune.preprocess(s)
+			if s.find(":=") >= 0:										# assignment
+				key,value = ClawhammerTune.parseAssignment(s)
+				self.keys[key] = value
+				self.macros = {}										# macros may have changed.
+				if key.startswith("chord_"):							# chords have, bars may differ.
+					self.chordTable.update(Bar.createChordTable({ key:value }))
+					self.barCache = {}
+				if key in pending:
+					pending.remove(key)
+				yield ".{0}:={1}\n".format(key,value)
+			else:
+				s = self.expandMacros(s,[])
+				for b in [x.strip() for x in s.split("|") if x.strip() != ""]:
+					for key in pending:									# defaults before first bar
+						yield ".{0}:={1}\n".format(key,self.keys[key])
+					pending = []
+					barNumber += 1
+					try:
+						bar = self.createBar(barNumber,b)
+					except MusicException as e:
+						errors.append(e)
+						continue
+					yield "|{0}\n".format(bar.render())
+					if len(self.barCache) > self.cacheSize:				# keep memory bounded.
+						self.barCache = {}
+		for key in pending:												# tune with no bars.
+			yield ".{0}:={1}\n".format(key,self.keys[key])
+		if len(errors) != 0:
+			raise errors[0] if len(errors) == 1 else MusicExceptionList(errors)
+	#
+	#		Compile lines straight to a file-like sink.
+	#
+	def compileTo(self,lines,sink):
+		for record in self.compile(lines):
+			sink.write(record)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Compile .claw to .plux, stdin to stdout by default")
+	parser.add_argument("source",nargs = "?",help = "source .claw file")
+	parser.add_argument("-o","--output",help = "target .plux file")
+	args = parser.parse_args()
+	source = sys.stdin if args.source is None else open(args.source)
+	sink = sys.stdout if args.output is None else open(args.output,"w")
+	try:
+		StreamingTune("<stdin>" if args.source is None else args.source).compileTo(source,sink)
+	except MusicException as e:
+		sys.stderr.write(e.getMessage()+"\n")
+		sys.exit(1)
+	finally:
+		sink.flush()
+		if sink is not sys.stdout:
+			sink.close()
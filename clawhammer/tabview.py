@@ -0,0 +1,114 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		tabview.py
+#		Purpose:	Tab text for any part of a tune, a line or page at a time
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import sys,argparse,collections
+from .tune import *
+
+# ***************************************************************************************************
+#
+#		Tab is laid out as systems of barsPerLine bars, each the chord row and strings 1-5,
+#		with a blank line between them, as toString() shows a bar. A page is as many whole
+#		systems as fit in linesPerPage. Only the bars asked for are formatted, and the rows of
+#		the most recently used bars are kept, so repeats are usually formatted once and memory
+#		doesn't grow with the length of the tune.
+#
+# ***************************************************************************************************
+
+class TabView(object):
+	def __init__(self,tune,barsPerLine = 4,linesPerPage = 60):
+		self.tune = tune
+		self.barsPerLine = max(1,barsPerLine)
+		self.linesPerPage = linesPerPage
+		self.rows = collections.OrderedDict() 										# bar storage id => tab rows
+	#
+	#		Bars per line for a line width in characters.
+	#
+	@staticmethod
+	def getBarsPerLine(tune,width):
+		cells = tune.bars[0].notes * 2 * 9 + 1 if len(tune.bars) != 0 else 73
+		return max(1,(width - 2) // cells)
+	#
+	#		Tab rows of bar n (from 0), formatted when first asked for.
+	#
+	def getRows(self,n):
+		bar = self.tune.bars[n]
+		key = id(bar.frets)															# shared by repeats
+		if key in self.rows:
+			self.rows.move_to_end(key)
+		else:
+			self.rows[key] = bar.getTabRows()
+			if len(self.rows) > TabView.CACHESIZE:
+				self.rows.popitem(last = False)
+		return self.rows[key]
+	#
+	#		Lines of tab for bars start to end-1, one at a time.
+	#
+	def lines(self,start = 0,end = None):
+		end = len(self.tune.bars) if end is None else min(end,len(self.tune.bars))
+		for first in range(start,end,self.barsPerLine):
+			if first != start:
+				yield ""
+			rows = [self.getRows(n) for n in range(first,min(first+self.barsPerLine,end))]
+			for s in range(0,6):
+				yield str(s)+"|"+"|".join([x[s] for x in rows])+"|"
+	#
+	#		Pages, counted from 0, each a list of lines.
+	#
+	def getBarsPerPage(self):
+		return max(1,(self.linesPerPage + 1) // 7) * self.barsPerLine
+
+	def getPageCount(self):
+		return (len(self.tune.bars) + self.getBarsPerPage() - 1) // self.getBarsPerPage()
+
+	def getPage(self,page):
+		return list(self.lines(page * self.getBarsPerPage(),(page+1) * self.getBarsPerPage()))
+
+	def pages(self,first = 0,last = None):
+		last = self.getPageCount() if last is None else min(last,self.getPageCount())
+		for page in range(first,last):
+			yield self.getPage(page)
+	#
+	#		Write bars start to end-1 to a file name or a file-like sink, a line at a time.
+	#
+	def write(self,target,start = 0,end = None):
+		sink = open(target,"w") if isinstance(target,str) else target
+		try:
+			for line in self.lines(start,end):
+				sink.write(line+"\n")
+		finally:
+			if sink is not target:
+				sink.close()
+
+TabView.CACHESIZE = 256 															# bars whose rows are kept
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Show a tune as tab")
+	parser.add_argument("source",help = "source .claw file")
+	parser.add_argument("-f","--first",type = int,default = 1,help = "first bar")
+	parser.add_argument("-n","--count",type = int,help = "number of bars, default to the end")
+	parser.add_argument("-p","--page",type = int,help = "show this page (from 1) instead")
+	parser.add_argument("-l","--lines",type = int,default = 60,help = "lines in a page")
+	parser.add_argument("-w","--width",type = int,default = 80,help = "line width")
+	parser.add_argument("-o","--output",help = "write to this file")
+	args = parser.parse_args()
+	try:
+		tune = ClawhammerTune(args.source)
+	except MusicException as e:
+		print("Error : "+e.getMessage())
+		sys.exit(1)
+	view = TabView(tune,TabView.getBarsPerLine(tune,args.width),args.lines)
+	if args.page is not None:
+		start = (args.page - 1) * view.getBarsPerPage()
+		end = start + view.getBarsPerPage()
+	else:
+		start = args.first - 1
+		end = start + args.count if args.count is not None else None
+	view.write(args.output if args.output is not None else sys.stdout,start,end)
@@ -9,9 +9,79 @@
 # ***************************************************************************************************
 # ***************************************************************************************************
 
-import re,os
-from musicex import *
-from bar import *
+import re,os,sys
+if not __package__:													# run as a script, e.g. python tune.py
+	sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	import clawhammer
+	__package__ = "clawhammer"
+from .musicex import *
+from .bar import *
+from .profiler import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		What compiling a tune needs, whether all at once or a line at a time : the keys, the
+#		chords and macros from them, and the cache of compiled bars.
+#
+# ***************************************************************************************************
+
+class TuneCompiler(object):
+	def __init__(self,tuneName,rng = None):
+		self.tuneName = tuneName
+		self.rng = rng 									# random source, None for random module
+		self.keys = dict(TuneCompiler.DEFAULTS)
+		self.chordTable = {}
+		self.macros = {}								# expanded macros
+		self.barCache = {}								# compiled bars by descriptor
+	#
+	#		Lower case a source line and remove tabs and comments.
+	#
+	@staticmethod
+	def preprocess(line):
+		line = line.lower().replace("\t"," ")
+		return line.strip() if line.find("//") < 0 else line[:line.find("//")].strip()
+	#
+	#		Split key := value
+	#
+	@staticmethod
+	def parseAssignment(line):
+		parts = [x.strip() for x in line.split(":=") if x.strip() != ""]
+		if len(parts) != 2 or parts[0] == "":
+			raise MusicException("Bad assignment "+line)
+		return parts
+	#
+	#		Expand {macro} references. Each macro is expanded once, active is the chain of macros
+	#		being expanded, used to detect recursion.
+	#
+	def expandMacros(self,s,active):
+		if s.find("{") < 0:
+			return s
+		s = TuneCompiler.MACRO.split(s)				# split into bits, macros are odd.
+		for i in range(0,len(s)):
+			if i % 2 == 0:
+				if s[i].find("{") >= 0:
+					raise MusicException("Unterminated macro "+s[i])
+			else:
+				name = s[i][1:-1]
+				if name not in self.macros:
+					if name not in self.keys:
+						raise MusicException("Unknown macro "+s[i])
+					if name in active:
+						raise MusicException("Recursive macro "+s[i])
+					self.macros[name] = self.expandMacros(self.keys[name],active+[name])
+				s[i] = self.macros[name]
+		return "".join(s)
+	#
+	#		Create a bar. Bars without randoms are compiled once and shared. The descriptor is
+	#		enough of a key as the keys are fixed for the tune and all bars start unfretted.
+	#
+	def createBar(self,barNumber,descriptor):
+		if descriptor.find("@") >= 0:
+			return Bar(barNumber,descriptor,self.keys,chordTable = self.chordTable,rng = self.rng)
+		if descriptor not in self.barCache:
+			self.barCache[descriptor] = Bar(barNumber,descriptor,self.keys,chordTable = self.chordTable)
+		return self.barCache[descriptor].share(barNumber)
 
 # ***************************************************************************************************
 #	
@@ -19,52 +89,94 @@ from bar import *
 #
 # ***************************************************************************************************
 
-class ClawhammerTune(object):
-	def __init__(self,tuneSource):
-		self.tuneName = os.path.split(tuneSource)[1][:-5].strip()
+class ClawhammerTune(TuneCompiler):
+	def __init__(self,tuneSource,rng = None):
+		TuneCompiler.__init__(self,os.path.split(tuneSource)[1][:-5].strip(),rng)
+		try:
+			with CompileProfiler.file(tuneSource):
+				self.load(tuneSource)
+		except MusicException as e:						# tag errors with the source.
+			for err in e.errors if isinstance(e,MusicExceptionList) else [e]:
+				err.fileName = tuneSource
+			raise
+	#
+	#		Load and compile the tune
+	#
+	def load(self,tuneSource):
+		with CompileProfiler.phase("read"):
+			src = open(tuneSource).readlines()
 														# Preprocess
-		src = [x.lower().replace("\t"," ") for x in open(tuneSource).readlines()]
-		src = [x.strip() if x.find("//") < 0 else x[:x.find("//")].strip() for x in src]
+		with CompileProfiler.phase("preprocess"):
+			src = [ClawhammerTune.preprocess(x) for x in src]
 														# Do keys.
-		MusicException.NUMBER = 0														
-		self.keys = { "beats":"4","tempo":"60","tuning":"gdgbd" }
-		for s in [x for x in src if x.find(":=") >= 0]:
-			parts = [x.strip() for x in s.split(":=") if x.strip() != ""]
-			if len(parts) != 2 or parts[0] == "":
-				raise MusicException("Bad assignment "+s)
-			self.keys[parts[0]] = parts[1]
+		with CompileProfiler.phase("keys"):
+			for s in [x for x in src if x.find(":=") >= 0]:
+				parts = ClawhammerTune.parseAssignment(s)
+				self.keys[parts[0]] = parts[1]
 
+		self.chordTable = Bar.createChordTable(self.keys)
 		self.bars = []									# Create the bars
+		errors = []										# bar errors, reported together
 		for s in [x for x in src if x.find(":=") < 0]:
-			while s.find("{") >= 0:						# replace all equates.
-				s = re.split("(\\{.*?\\})",s)			# split into bits.
-				for i in range(0,len(s)):				# replace the macro bits
-					if s[i].startswith("{"):
-						if s[i][1:-1] not in self.keys:
-							raise MusicException("Unknown macro "+s[i])
-						s[i] = self.keys[s[i][1:-1]]
-				s = "".join(s)
+			with CompileProfiler.phase("macros"):
+				s = self.expandMacros(s,[])				# replace all equates.
 														# Now create all the bars
 			for b in [x.strip() for x in s.split("|") if x.strip() != ""]:
-				newBar = Bar(len(self.bars)+1,b,self.keys)
-				self.bars.append(newBar)
+				try:
+					with CompileProfiler.bar(len(self.bars)+len(errors)+1,b):
+						self.bars.append(self.createBar(len(self.bars)+len(errors)+1,b))
+				except MusicException as e:
+					errors.append(e)
+		if len(errors) != 0:
+			raise errors[0] if len(errors) == 1 else MusicExceptionList(errors)
 	#
 	#		Render the bars
 	#
 	def render(self,targetDirectory,overwrite = None):
 		target = self.tuneName+".plux" if overwrite is None else overwrite
-		h = open(targetDirectory+os.sep+target,"w")
-		h.write("".join(".{0}:={1}\n".format(k,self.keys[k]) for k in self.keys.keys()))
-		h.write("".join(["|{0}\n".format(x.render()) for x in self.bars]))
-		h.close()
+		return ClawhammerTune.writeFile(targetDirectory+os.sep+target,self.renderText())
+	#
+	#		Get the .plux text
+	#
+	def renderText(self):
+		with CompileProfiler.phase("render"):
+			keys = "".join(".{0}:={1}\n".format(k,self.keys[k]) for k in self.keys.keys())
+			return keys + "".join(["|{0}\n".format(x.render()) for x in self.bars])
+	#
+	#		Write text (or bytes) to a file, only if it has changed. Returns True if written.
+	#
+	@staticmethod
+	def writeFile(fileName,text):
+		data = text if isinstance(text,bytes) else text.replace("\n",os.linesep).encode()
+		with CompileProfiler.phase("write",len(data)):
+			if os.path.exists(fileName) and open(fileName,"rb").read() == data:
+				return False
+			h = open(fileName,"wb")
+			h.write(data)
+			h.close()
+		return True
+	#
+	#		Number in a key, read as the player's val() does, the leading whole number. The
+	#		default is used if there isn't one, or it isn't positive.
+	#
+	@staticmethod
+	def getNumber(keys,key):
+		m = ClawhammerTune.NUMBER.match(keys.get(key,"").strip())
+		value = int(m.group(0)) if m is not None else 0
+		return value if value > 0 else int(ClawhammerTune.DEFAULTS[key])
 	#
 	#		Show as text
 	#
 	def toString(self):
 		return "\n".join([x.toString() for x in self.bars])
 
+TuneCompiler.DEFAULTS = { "beats":"4","tempo":"60","tuning":"gdgbd" }
+TuneCompiler.MACRO = re.compile("(\\{.*?\\})")
+ClawhammerTune.NUMBER = re.compile("[\\-\\+]?\\d+")
+ClawhammerTune.VERSION = 1											# Bump when the .plux output changes
+
 if __name__ == "__main__":
-	tn = ClawhammerTune("cripple.claw")
-	tn.render("./")
-	tn.render("../agkbanjo/media/music","__test.plux")
+	tn = ClawhammerTune(getPath("clawhammer","cripple.claw"))
+	tn.render(getPath("clawhammer"))
+	tn.render(getPath("agkbanjo","media","music"),"__test.plux")
 
@@ -0,0 +1,87 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		variants.py
+#		Purpose:	Generate seeded variants of a tune with random (@s @f) bars
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,time,random,hashlib,argparse
+from .tune import *
+
+# ***************************************************************************************************
+#
+#		The template is compiled once. Bars without randoms are rendered once and reused, only
+#		bars with randoms are compiled for each variant, using a generator seeded from the
+#		seed, so the same seed always gives the same variants. Variants with the same .plux
+#		text as an earlier one are dropped.
+#
+# ***************************************************************************************************
+
+class VariantGenerator(object):
+	def __init__(self,tuneSource):
+		self.tune = ClawhammerTune(tuneSource,random.Random(0))
+		self.header = "".join(".{0}:={1}\n".format(k,self.tune.keys[k]) for k in self.tune.keys.keys())
+		self.parts = [] 															# text, or bar to compile
+		for bar in self.tune.bars:
+			if bar.descriptor.find("@") >= 0:
+				self.parts.append(bar)
+			else:
+				self.parts.append("|{0}\n".format(bar.render()))
+		self.randomBars = len([x for x in self.parts if isinstance(x,Bar)])
+	#
+	#		Create the .plux text of one variant.
+	#
+	def createVariant(self,rng):
+		text = [ self.header ]
+		for part in self.parts:
+			if isinstance(part,Bar):
+				part = "|{0}\n".format(Bar(part.barNumber,part.descriptor,self.tune.keys,chordTable = self.tune.chordTable,rng = rng).render())
+			text.append(part)
+		return "".join(text)
+	#
+	#		Generate up to count different variants. Gives up after attempts tries, as there may
+	#		not be that many different ones.
+	#
+	def generate(self,count,seed = 0,attempts = None):
+		attempts = attempts if attempts is not None else count * 10
+		rng = random.Random(seed)
+		seen = set()
+		while len(seen) < count and attempts > 0:
+			attempts -= 1
+			text = self.createVariant(rng)
+			hash = hashlib.sha1(text.encode()).digest()
+			if hash not in seen:
+				seen.add(hash)
+				yield text
+			if self.randomBars == 0: 												# only one variant
+				break
+	#
+	#		Write variants as <tune> nnnn.plux, returns the files written.
+	#
+	def write(self,targetDirectory,count,seed = 0):
+		if not os.path.exists(targetDirectory):
+			os.makedirs(targetDirectory)
+		files = []
+		for text in self.generate(count,seed):
+			files.append(targetDirectory+os.sep+"{0} {1:04}.plux".format(self.tune.tuneName,len(files)+1))
+			ClawhammerTune.writeFile(files[-1],text)
+		return files
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Generate seeded variants of a tune with random bars")
+	parser.add_argument("source",help = "template .claw file")
+	parser.add_argument("-n","--count",type = int,default = 10,help = "number of variants")
+	parser.add_argument("-s","--seed",type = int,default = 0,help = "random seed")
+	parser.add_argument("-o","--output",default = "variants",help = "target directory")
+	args = parser.parse_args()
+	try:
+		start = time.perf_counter()
+		files = VariantGenerator(args.source).write(args.output,args.count,args.seed)
+		print("Wrote {0} variants in {1:.2f}s".format(len(files),time.perf_counter()-start))
+	except MusicException as e:
+		print("Error : "+e.getMessage())
+		sys.exit(1)
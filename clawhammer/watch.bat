@@ -0,0 +1,4 @@
+@echo off
+pushd ..
+python -m clawhammer.watch
+popd
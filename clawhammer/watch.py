@@ -0,0 +1,150 @@
+# ***************************************************************************************************
+# ***************************************************************************************************
+#
+#		Name:		watch.py
+#		Purpose:	Watch the music tree, recompile tunes as they are saved.
+#		Date:		18th October 2026
+#		Author:		Paul Robson (paul@robsons.org.uk)
+#
+# ***************************************************************************************************
+# ***************************************************************************************************
+
+import os,sys,time,argparse
+if not __package__:													# run as a script, e.g. python watch.py
+	sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	import clawhammer
+	__package__ = "clawhammer"
+from .buildtree import *
+from .buildindex import *
+from . import getPath
+
+# ***************************************************************************************************
+#
+#		Polls the source tree for changed .claw files. Each change recompiles just that tune,
+#		copies it to __test.plux and rewrites the index of the directory it is in, and the
+#		catalog.
+#
+# ***************************************************************************************************
+
+class MusicWatcher(object):
+	def __init__(self,sourceDir,targetDir,interval = 0.05):
+		self.sourceDir = sourceDir.replace("/",os.sep)
+		self.targetDir = targetDir.replace("/",os.sep)
+		self.interval = interval 										# seconds between polls
+		self.builder = MusicBuilder()
+		self.indexer = BuildIndex()
+	#
+	#		Build everything once, then watch.
+	#
+	def run(self):
+		for e in self.builder.buildTree(self.sourceDir,self.targetDir):
+			print("Error : "+e)
+		self.indexer.build(self.targetDir,self.builder.listing)
+		self.files = self.scan()
+		print("Watching "+self.sourceDir)
+		while True:
+			time.sleep(self.interval)
+			self.poll()
+	#
+	#		Check for changes once.
+	#
+	def poll(self):
+		files = self.scan()
+		for f in sorted(files.keys()):
+			if self.files.get(f) != files[f]:
+				self.handle(self.changed,f)
+		for f in sorted(self.files.keys()):
+			if f not in files:
+				self.handle(self.removed,f)
+		self.files = files
+	#
+	#		Do something for one file, reporting anything that goes wrong and carrying on. The
+	#		file's time is recorded anyway, so it isn't tried again until it is saved again.
+	#
+	def handle(self,action,sourceFile):
+		try:
+			action(sourceFile)
+		except MusicException as e:
+			print("Error : "+(e.getMessage() if e.fileName is not None else sourceFile+" : "+e.getMessage()))
+		except Exception as e:
+			print("Error : {0} : {1} {2}".format(sourceFile,type(e).__name__,e))
+	#
+	#		Get the modified time and size of every source. Anything that goes while being
+	#		scanned is left out.
+	#
+	def scan(self):
+		files = {}
+		pending = [self.sourceDir]
+		while len(pending) != 0:
+			try:
+				entries = list(os.scandir(pending.pop()))
+			except OSError:
+				continue
+			for entry in entries:
+				try:
+					if entry.is_dir():
+						pending.append(entry.path)
+					elif entry.name.endswith(".claw"):
+						stat = entry.stat()
+						files[entry.path] = (stat.st_mtime_ns,stat.st_size)
+				except OSError:
+					pass
+		return files
+	#
+	#		Source added or changed.
+	#
+	def changed(self,sourceFile):
+		start = time.perf_counter()
+		targetDir = self.getTargetDirectory(sourceFile)
+		newDirectories = self.getNewDirectories(targetDir)
+		output = self.builder.buildOne(sourceFile)
+		for e in self.builder.errors:
+			print("Error : "+e)
+		if output is not None:
+			self.updateIndex(targetDir,newDirectories)
+			print("Built {0} in {1:.0f}ms".format(output,(time.perf_counter()-start)*1000))
+	#
+	#		Source deleted. Target folders whose source folder has gone lose their index, and
+	#		are removed when empty, then the index of the first folder left is rewritten.
+	#
+	def removed(self,sourceFile):
+		self.builder.removeOne(sourceFile)
+		targetDir = self.getTargetDirectory(sourceFile)
+		sourceDir = os.path.dirname(sourceFile)
+		while targetDir != self.targetDir and not os.path.exists(sourceDir):
+			if os.path.exists(targetDir+os.sep+"index.txt"):
+				os.remove(targetDir+os.sep+"index.txt")
+			if os.path.exists(targetDir) and len(os.listdir(targetDir)) == 0:
+				os.rmdir(targetDir)
+			targetDir,sourceDir = os.path.dirname(targetDir),os.path.dirname(sourceDir)
+		if os.path.exists(targetDir):
+			self.updateIndex(targetDir,[])
+	#
+	#		Target folders that don't exist yet, from targetDir up to the first that does.
+	#
+	def getNewDirectories(self,targetDir):
+		directories = []
+		while targetDir != self.targetDir and not os.path.exists(targetDir):
+			directories.append(targetDir)
+			targetDir = os.path.dirname(targetDir)
+		return directories
+	#
+	#		Rewrite a directory index, and the parent's of each new directory so it is listed.
+	#
+	def updateIndex(self,targetDir,newDirectories):
+		self.indexer.buildDirectory(self.targetDir,targetDir)
+		for directory in newDirectories:
+			self.indexer.buildDirectory(self.targetDir,os.path.dirname(directory))
+		self.indexer.buildCatalog(self.targetDir)
+
+	def getTargetDirectory(self,sourceFile):
+		return self.targetDir+os.path.dirname(sourceFile)[len(self.sourceDir):]
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Recompile tunes as they are saved")
+	parser.add_argument("-i","--interval",type = float,default = 0.05,help = "poll interval in seconds")
+	args = parser.parse_args()
+	try:
+		MusicWatcher(getPath("music"),getPath("agkbanjo","media","music"),args.interval).run()
+	except KeyboardInterrupt:
+		pass
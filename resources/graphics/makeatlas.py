@@ -9,26 +9,40 @@
 # ***************************************************************************************
 # ***************************************************************************************
 
-import os,sys
+import os,io,sys,json,time,hashlib,argparse
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
 # ***************************************************************************************
-#							Represents a single graphic object
+#
+#		Represents a single graphic object. Only the header is decoded to start with, the
+#		pixels are loaded when it is composited and not kept.
+#
 # ***************************************************************************************
 
 class GraphicObject:
 	def __init__(self,fname):
 		self.fileName = fname
-		self.image = Image.open(fname)
+		data = open(fname,"rb").read()
+		self.hash = hashlib.sha1(data).hexdigest()										# content hash for the cache
+		with Image.open(io.BytesIO(data)) as image:										# header only
+			self.size = image.size
 
 	def width(self):
-		return self.image.size[0]
+		return self.size[0]
 
 	def height(self):
-		return self.image.size[1]
+		return self.size[1]
+
+	def load(self):																		# decode the pixels
+		image = Image.open(self.fileName)
+		image.load()
+		return image
 
-	def render(self,atlas,x,y):
-		atlas.paste(self.image,(x,y))
+	def render(self,atlas,x,y,image = None):
+		image = image if image is not None else self.load()
+		atlas.paste(image,(x,y))
+		image.close()
 
 	def getName(self):
 		return os.path.basename(self.fileName)[:-4]
@@ -36,6 +50,65 @@ class GraphicObject:
 	def renderSubImageFile(self,f,x,y):
 		f.write("{0}:{1}:{2}:{3}:{4}\n".format(self.getName(),x,y,self.width(),self.height()))
 
+# ***************************************************************************************
+#
+#		MaxRects bin. Keeps a list of maximal free rectangles (x,y,w,h), which may overlap.
+#		Each rectangle is put where its bottom is highest (then leftmost), then every free
+#		rectangle it overlaps is split round it.
+#
+# ***************************************************************************************
+
+class MaxRectsBin:
+	def __init__(self,width,height):
+		self.freeList = [ (0,0,width,height) ]											# all free to start.
+
+	def insert(self,width,height):														# returns (x,y) or None
+		best = None
+		for fx,fy,fw,fh in self.freeList:
+			if fw >= width and fh >= height:
+				score = (fy+height,fx)													# bottom left
+				if best is None or score < best[0]:
+					best = (score,fx,fy)
+		if best is None:
+			return None
+		self.place(best[1],best[2],width,height)
+		return (best[1],best[2])
+
+	def place(self,x,y,width,height):
+		kept = []																		# untouched free rectangles
+		split = []																		# new pieces from split ones
+		for f in self.freeList:
+			if x >= f[0]+f[2] or x+width <= f[0] or y >= f[1]+f[3] or y+height <= f[1]:
+				kept.append(f)															# doesn't overlap, keep it
+			else:																		# split into up to 4.
+				if x > f[0]:
+					split.append((f[0],f[1],x-f[0],f[3]))
+				if x+width < f[0]+f[2]:
+					split.append((x+width,f[1],f[0]+f[2]-x-width,f[3]))
+				if y > f[1]:
+					split.append((f[0],f[1],f[2],y-f[1]))
+				if y+height < f[1]+f[3]:
+					split.append((f[0],y+height,f[2],f[1]+f[3]-y-height))
+		touching = [f for f in kept if f[0] <= x+width and f[0]+f[2] >= x and f[1] <= y+height and f[1]+f[3] >= y]
+		self.freeList = kept + self.prune(split,touching)
+
+	#
+	#		Remove new pieces contained in another free rectangle. Untouched ones can't be, and
+	#		every new piece borders the placed rectangle, so only free rectangles touching that
+	#		need checking.
+	#
+	def prune(self,split,touching):
+		result = []
+		for f in sorted(set(split),key = lambda f: -f[2]*f[3]):							# larger first.
+			contained = False
+			for g in result + touching:
+				if f[0] >= g[0] and f[1] >= g[1] and f[0]+f[2] <= g[0]+g[2] and f[1]+f[3] <= g[1]+g[3]:
+					contained = True
+					break
+			if not contained:
+				result.append(f)
+		return result
+
 # ***************************************************************************************
 #									Packer worker class
 # ***************************************************************************************
@@ -48,64 +121,219 @@ class GraphicPacker:
 	def append(self,graphicObject):
 		self.imageList.append({ "object":graphicObject, 								# add a new object
 							"area":graphicObject.width()*graphicObject.height() })
-		while graphicObject.width() > self.imageWidth:									# make the atlas wide enogh
-			self.imageWidth = self.imageWidth * 2
-
-	def pack(self,packStep = 4):
-		self.atlasHeight = 0
-		iList = sorted(self.imageList,key=lambda k: k['area'],reverse = True)			# list sorted largest first.
-		for i in range(0,len(iList)):													# for every element.
-			x = 0																		# suggested position.
-			y = 0	
-			isOk = False 																# set true when done.
-			while not isOk:																# keep going until found.
-				iList[i]["left"] = x													# save position
-				iList[i]["top"] = y
-				iList[i]["right"] = x + iList[i]["object"].width() 
-				iList[i]["bottom"] = y + iList[i]["object"].height() 
-				isOk = self.canPlace(iList[i],iList,0,i-1)								# check if it can go there
-				if not isOk:															# it can't.
-					x = x + packStep															# try slightly to right.
-					if x + iList[i]["object"].width() >= self.imageWidth: 				# if it can't fit on this line
-						x = 0															# move down.
-						y = y + packStep
-
-			self.atlasHeight = max(self.atlasHeight,iList[i]["bottom"]+2)				# update the bottom size
-
-	def render(self,baseName):
+
+	#
+	#		Pack the images. Each has padding pixels to its right and below it, so padding 1
+	#		gives the same single pixel gap as the old packer. Tries a range of atlas widths
+	#		(or just the one given) and keeps the one with the smallest area.
+	#
+	def pack(self,padding = 1,powerOfTwo = False,width = None):
+		widest = max([x["object"].width() for x in self.imageList]+[1]) + padding
+		if width is not None:															# make it wide enough
+			while width < widest:
+				width = width * 2
+		widths = [ width ] if width is not None else self.candidateWidths(widest,powerOfTwo)
+		best = None
+		area = sum([(x["object"].width()+padding)*(x["object"].height()+padding) for x in self.imageList])
+		for w in widths:
+			if width is None and area > w * GraphicPacker.MAXSIZE:						# can't possibly fit.
+				continue
+			layout = self.packWidth(w,padding)
+			if layout is not None:
+				height = max([x[1]+x[3] for x in layout]+[0]) + padding				# leave gap at bottom
+				if powerOfTwo:
+					height = self.nextPowerOfTwo(height)
+				if best is None or w*height < best[0]*best[1]:
+					best = (w,height,layout)
+		if best is None:
+			raise Exception("Cannot pack images")
+		self.imageWidth,self.atlasHeight = best[0],best[1]
+		for image,position in zip(self.imageList,best[2]):
+			image["left"],image["top"] = position[0],position[1]
+			image["right"] = image["left"]+image["object"].width()
+			image["bottom"] = image["top"]+image["object"].height()
+
+	def candidateWidths(self,widest,powerOfTwo):										# widths to try, powers of two
+		widths = []																		# and half way between.
+		w = self.nextPowerOfTwo(widest)
+		while w <= max(GraphicPacker.MAXSIZE,widest):
+			widths += [ w ] if powerOfTwo else [ w * 3 // 4,w ]
+			w = w * 2
+		return sorted(set([x for x in widths if x >= widest] + ([] if powerOfTwo else [widest])))
+
+	def packWidth(self,width,padding):													# returns (x,y,w,h) for each
+		order = sorted(range(0,len(self.imageList)), 									# largest first, then name
+						key = lambda i: (-self.imageList[i]["area"],self.imageList[i]["object"].getName()))
+		bin = MaxRectsBin(width,max([x["object"].height()+padding for x in self.imageList]+[GraphicPacker.MAXSIZE]))
+		layout = [ None ] * len(self.imageList)
+		for i in order:
+			w = self.imageList[i]["object"].width()
+			h = self.imageList[i]["object"].height()
+			position = bin.insert(w+padding,h+padding)
+			if position is None:
+				return None
+			layout[i] = (position[0],position[1],w,h)
+		return layout
+
+	def nextPowerOfTwo(self,n):
+		p = 1
+		while p < n:
+			p = p * 2
+		return p
+
+	def efficiency(self):																# used area / atlas area
+		used = sum([x["area"] for x in self.imageList])
+		return used / max(1,self.imageWidth * self.atlasHeight)
+
+	#
+	#		Place new images round the ones already in the previous layout, keeping the atlas
+	#		the same size. Returns False if they don't fit, the options have changed or less
+	#		than MINEFFICIENCY of the atlas would be used (as images have been removed or
+	#		shrunk), when it needs packing again.
+	#
+	def packIncremental(self,cache,padding = 1,powerOfTwo = False,width = None):
+		if cache.atlas is None or cache.options != AtlasCache.getOptions(padding,powerOfTwo,width):
+			return False
+		bin = MaxRectsBin(cache.atlas[0],cache.atlas[1])
+		added = []
+		for image in self.imageList:
+			previous = cache.sprites.get(image["object"].getName())
+			if previous is not None and previous["size"] == list(image["object"].size):	# same size, same place
+				image["left"],image["top"] = previous["left"],previous["top"]
+				bin.place(image["left"],image["top"],image["object"].width()+padding,image["object"].height()+padding)
+			else:
+				added.append(image)
+		for image in sorted(added,key = lambda k: (-k["area"],k["object"].getName())):
+			position = bin.insert(image["object"].width()+padding,image["object"].height()+padding)
+			if position is None:
+				return False
+			image["left"],image["top"] = position
+		self.imageWidth,self.atlasHeight = cache.atlas[0],cache.atlas[1]
+		for image in self.imageList:
+			image["right"] = image["left"]+image["object"].width()
+			image["bottom"] = image["top"]+image["object"].height()
+		return self.efficiency() >= GraphicPacker.MINEFFICIENCY
+
+	#
+	#		Render the atlas. If the previous atlas is the same size, it is updated with only
+	#		the images that have changed or moved, otherwise all are drawn. Images are decoded
+	#		in parallel.
+	#
+	def render(self,baseName,cache = None):
 		baseName = baseName.lower()														# all file names l/c
-		atlas = Image.new("RGBA",(self.imageWidth,self.atlasHeight),(0,0,0,0))			# blue background
-		for image in self.imageList:													# render all images
-			image["object"].render(atlas,image["left"],image["top"])	
-		atlas.save(baseName+".png",optimize=True)										# save atlas image	
+		atlas = None
+		redraw = self.imageList
+		if cache is not None and cache.isAtlasReusable(baseName,self.imageWidth,self.atlasHeight):
+			atlas = Image.open(baseName+".png").convert("RGBA")
+			redraw = [x for x in self.imageList if not cache.isUnchanged(x)]
+			unchanged = set([x["object"].getName() for x in self.imageList]) - set([x["object"].getName() for x in redraw])
+			for name,previous in cache.sprites.items():									# clear removed, moved and
+				if name not in unchanged:												# changed images.
+					atlas.paste((0,0,0,0),(previous["left"],previous["top"],previous["left"]+previous["size"][0],previous["top"]+previous["size"][1]))
+		if atlas is None:
+			atlas = Image.new("RGBA",(self.imageWidth,self.atlasHeight),(0,0,0,0))		# blue background
+		with ThreadPoolExecutor() as executor:											# render all images
+			for image,pixels in zip(redraw,executor.map(lambda x: x["object"].load(),redraw)):
+				image["object"].render(atlas,image["left"],image["top"],pixels)
+		atlas.save(baseName+".png",optimize=True)										# save atlas image
 
 		subText = open(baseName+" subimages.txt","w")									# create text
 		for image in self.imageList:
 			image["object"].renderSubImageFile(subText,image["left"],image["top"])
 		subText.close()
 
-	def canPlace(self,item,iList,first,last):
-		for i in range(first,last+1):													# work through all.
-			if self.collides(iList[i],item):											# if collision found return False
+GraphicPacker.MAXSIZE = 4096															# largest atlas tried.
+GraphicPacker.MINEFFICIENCY = 0.75 														# repack if less is used.
+
+# ***************************************************************************************
+#
+#		Remembers the hash of each source sprite, where it was placed, the options used and
+#		the hashes of the output files, so unchanged builds can be skipped and new sprites
+#		added without moving the old ones.
+#
+# ***************************************************************************************
+
+class AtlasCache:
+	def __init__(self,fileName,load = True):
+		self.fileName = fileName
+		data = json.load(open(fileName)) if load and os.path.exists(fileName) else {}
+		self.options = data.get("options")
+		self.sprites = data.get("sprites",{})											# name -> hash,size,left,top
+		self.atlas = data.get("atlas")													# [width,height]
+		self.outputs = data.get("outputs",{})											# output file -> hash
+
+	@staticmethod
+	def getOptions(padding,powerOfTwo,width):
+		return { "padding":padding,"powerOfTwo":powerOfTwo,"width":width }
+
+	@staticmethod
+	def hashFile(fileName):
+		return hashlib.sha1(open(fileName,"rb").read()).hexdigest() if os.path.exists(fileName) else None
+
+	def getOutputs(self,baseName):
+		return [ baseName+".png",baseName+" subimages.txt" ]
+
+	def getEntry(self,image):
+		return { "hash":image["object"].hash,"size":list(image["object"].size),"left":image["left"],"top":image["top"] }
+	#
+	#		True if nothing has changed, so there is no need to build.
+	#
+	def isCurrent(self,objects,options,baseName):
+		if options != self.options or len(objects) != len(self.sprites):
+			return False
+		for gob in objects:
+			if gob.hash != self.sprites.get(gob.getName(),{}).get("hash"):
 				return False
-		return True 																	# No collisions return true
-
-	def collides(self,r1,r2):															# Check two items collide.
-		separate = 	r1["right"] < r2["left"] or \
-					r1["left"] > r2["right"] or \
-					r1["top"] > r2["bottom"] or \
-					r1["bottom"] < r2["top"]
-		return not separate
-
-
-count = 0
-gpack = GraphicPacker()
-for root,dirs,files in os.walk("source"):												# source contains graphics
-	for f in files:																		# for each gfx file
-		count = count + 1
-		fName = root + os.sep + f
-		gob = GraphicObject(fName)														# create it
+		return self.isOutputCurrent(baseName)
+
+	def isOutputCurrent(self,baseName):
+		return all([f in self.outputs and self.outputs[f] == AtlasCache.hashFile(f) for f in self.getOutputs(baseName)])
+	#
+	#		True if the existing atlas can be updated rather than redrawn.
+	#
+	def isAtlasReusable(self,baseName,width,height):
+		return self.atlas == [width,height] and self.isOutputCurrent(baseName)
+
+	def isUnchanged(self,image):
+		return self.sprites.get(image["object"].getName()) == self.getEntry(image)
+	#
+	#		Record a build.
+	#
+	def update(self,packer,options,baseName):
+		self.options = options
+		self.sprites = { x["object"].getName():self.getEntry(x) for x in packer.imageList }
+		self.atlas = [ packer.imageWidth,packer.atlasHeight ]
+		self.outputs = { f:AtlasCache.hashFile(f) for f in self.getOutputs(baseName) }
+		json.dump({ "options":self.options,"sprites":self.sprites,"atlas":self.atlas,"outputs":self.outputs },
+																open(self.fileName,"w"),indent = 1,sort_keys = True)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Pack the source graphics into an atlas")
+	parser.add_argument("-p","--padding",type = int,default = 1,help = "pixels between images")
+	parser.add_argument("-2","--power-of-two",action = "store_true",help = "atlas sizes are powers of two")
+	parser.add_argument("-w","--width",type = int,help = "fixed atlas width")
+	parser.add_argument("-f","--full",action = "store_true",help = "repack and redraw everything")
+	args = parser.parse_args()
+	fileNames = []
+	for root,dirs,files in os.walk("source"):											# source contains graphics
+		fileNames += [ root + os.sep + f for f in sorted(files) ]						# for each gfx file
+	with ThreadPoolExecutor() as executor:												# hash and read headers
+		objects = list(executor.map(GraphicObject,fileNames))
+	options = AtlasCache.getOptions(args.padding,args.power_of_two,args.width)
+	cache = AtlasCache("__atlas.json",not args.full)
+	if cache.isCurrent(objects,options,"sprites"):
+		print("Atlas up to date, {0} sprites".format(len(objects)))
+		sys.exit(0)
+	gpack = GraphicPacker()
+	for gob in objects:
 		gpack.append(gob)																# append it
-gpack.pack()																			# pack the objects in
-gpack.render("sprites")																	# output them.
-print("Grabbed {0} sprites".format(count))
+	start = time.perf_counter()
+	incremental = gpack.packIncremental(cache,args.padding,args.power_of_two,args.width)
+	if not incremental:
+		gpack.pack(args.padding,args.power_of_two,args.width)							# pack the objects in
+	elapsed = time.perf_counter()-start
+	gpack.render("sprites",cache)														# output them.
+	cache.update(gpack,options,"sprites")
+	print("Grabbed {0} sprites".format(len(objects)))
+	print("Atlas {0} x {1}, {2:.1f}% used, {3} in {4:.0f}ms".format(gpack.imageWidth,gpack.atlasHeight,
+												gpack.efficiency()*100,"added" if incremental else "packed",elapsed*1000))